@@ -0,0 +1,265 @@
+# Copyright 2013, Jernej Kovacic
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+A module with angular distances between rotations.
+
+The angular distance between rotations, represented by unit quaternions
+'p' and 'q', is the angle of the rotation p^(-1)*q, i.e.
+    2 * acos(|p.q|)
+where p.q is the dot product of quaternions' components. The absolute
+value accounts for the fact that 'q' and '-q' represent the same rotation.
+
+Pairwise distances between two sets of rotations (arrays of shape (N,4)
+and (M,4)) are computed in tiles of |p.q| whose size is bounded by
+a memory limit. Tiles may be processed by several threads. NumPy is
+imported on first pairwise computation.
+
+Author: Jernej Kovacic
+"""
+
+import math
+import numbers
+import exception
+import backend
+import batch
+from quaternion import Quaternion, QuaternionException
+from instance_checker import InstanceCheck
+
+
+class AngularDistanceException(exception.IException) :
+    """Exception raised at illegal angular distance operations"""
+    pass
+
+
+# Default memory limit (in bytes) of tiles' working memory
+DEFAULT_MEMORY_LIMIT = 64 * 1024 * 1024
+
+# Bytes per element of a tile: the dot products and up to two temporaries
+_TILE_ELEMENT_BYTES = 3 * 8
+
+# Minimum number of rows of a tile, that the column tiles' width is chosen for
+_MIN_TILE_ROWS = 64
+
+
+def distance(p, q) :
+    """
+    Angular distance (in radians, between 0 and pi) between rotations,
+    represented by quaternions 'p' and 'q' (both instances of Quaternion).
+    The quaternions do not need to be unit ones.
+
+    An AngularDistanceException is raised if any quaternion's norm equals 0
+    or it is not an instance of Quaternion.
+    """
+    if not (Quaternion.isQuaternion(p) and Quaternion.isQuaternion(q)) :
+        raise AngularDistanceException("Input must be an instance of Quaternion")
+    try :
+        pu = p.unit()
+        qu = q.unit()
+    except QuaternionException as qex :
+        raise AngularDistanceException("Invalid rotation quaternion: '{0}'".format(qex))
+    dot = abs(pu.o*qu.o + pu.i*qu.i + pu.j*qu.j + pu.k*qu.k)
+    return 2.0 * math.acos(min(dot, 1.0))
+
+
+def _prepare(p, q) :
+    # Converts 'p' and 'q' into normalized arrays of shape (N,4) and (M,4).
+    # If 'q' is None, 'p' is used instead.
+    try :
+        np = backend.numpy()
+    except backend.BackendException as bex :
+        raise AngularDistanceException("Pairwise distances require NumPy: '{0}'".format(bex))
+
+    def normalized(a, name) :
+        a = np.array(a, dtype=float)
+        if a.ndim != 2 or a.shape[1] != 4 :
+            raise AngularDistanceException("'{0}' must be an array of shape (N,4)".format(name))
+        n = np.linalg.norm(a, axis=1)
+        if a.shape[0] and n.min() < Quaternion.eps :
+            raise AngularDistanceException("'{0}' contains a zero-quaternion".format(name))
+        a /= n[:, None]
+        return a
+
+    pa = normalized(p, "p")
+    qa = pa if q is None else normalized(q, "q")
+    return np, pa, qa
+
+
+def _tiles(n, m, memoryLimit, workers) :
+    # Returns numbers of rows and columns of a tile, so that the working
+    # memory of all concurrently processed tiles is within the limit.
+    if not InstanceCheck.isFloat(memoryLimit) or memoryLimit <= 0 :
+        raise AngularDistanceException("Memory limit must be a positive number")
+    if workers is None :
+        workers = batch.workerCount()
+    elems = max(1, int(memoryLimit) // (_TILE_ELEMENT_BYTES * max(1, workers)))
+    cols = max(1, min(m, elems // _MIN_TILE_ROWS))
+    rows = max(1, min(n, elems // cols))
+    return rows, cols
+
+
+def _absDots(np, pa, qa, r0, r1, c0, c1) :
+    # A tile of |p.q| for rows [r0, r1) of 'pa' and rows [c0, c1) of 'qa'
+    d = np.matmul(pa[r0:r1], qa[c0:c1].T)
+    np.abs(d, out=d)
+    return d
+
+
+def _angles(np, d, out=None) :
+    # Converts |p.q| into angular distances, 'd' is overwritten
+    np.minimum(d, 1.0, out=d)
+    out = np.arccos(d, out=out)
+    out *= 2.0
+    return out
+
+
+def pairwise(p, q=None, memoryLimit=DEFAULT_MEMORY_LIMIT, workers=1) :
+    """
+    Dense matrix of pairwise angular distances.
+
+    Input:
+    p - an array of shape (N,4) with rotation quaternions
+    q - an array of shape (M,4) with rotation quaternions (default: 'p')
+    memoryLimit - limit (in bytes) of tiles' working memory, not including
+                  the output (default: DEFAULT_MEMORY_LIMIT)
+    workers - number of threads, None for the number of CPUs (default: 1)
+
+    Return:
+    an array of shape (N,M) with distances (in radians) between p[n] and q[m]
+
+    An AngularDistanceException is raised if any argument is invalid.
+    """
+    np, pa, qa = _prepare(p, q)
+    n, m = pa.shape[0], qa.shape[0]
+    rows, cols = _tiles(n, m, memoryLimit, workers)
+    out = np.empty((n, m))
+
+    def kernel(r0, r1) :
+        for c0 in range(0, m, cols) :
+            c1 = min(c0 + cols, m)
+            _angles(np, _absDots(np, pa, qa, r0, r1, c0, c1), out[r0:r1, c0:c1])
+
+    batch.forEachChunk(kernel, n, rows, workers)
+    return out
+
+
+def pairwiseThreshold(p, q=None, threshold=0.0, below=True,
+                      memoryLimit=DEFAULT_MEMORY_LIMIT, workers=1) :
+    """
+    Sparse pairwise angular distances, only those below (or above) a threshold.
+
+    Tiles are compared with cos(threshold/2), so the angles are only
+    calculated for the returned pairs.
+
+    Input:
+    p - an array of shape (N,4) with rotation quaternions
+    q - an array of shape (M,4) with rotation quaternions (default: 'p')
+    threshold - the threshold angle in radians (default: 0)
+    below - if True, pairs with distances not exceeding the threshold are
+            returned, otherwise pairs with distances not below it (default: True)
+    memoryLimit - limit (in bytes) of tiles' working memory (default: DEFAULT_MEMORY_LIMIT)
+    workers - number of threads, None for the number of CPUs (default: 1)
+
+    Return:
+    a tuple of three arrays (rows, columns, distances) in the coordinate
+    format, sorted by rows and columns
+
+    An AngularDistanceException is raised if any argument is invalid.
+    """
+    if not InstanceCheck.isFloat(threshold) :
+        raise AngularDistanceException("Threshold must be a float value")
+    np, pa, qa = _prepare(p, q)
+    n, m = pa.shape[0], qa.shape[0]
+    rows, cols = _tiles(n, m, memoryLimit, workers)
+
+    # angle <= threshold  <=>  |p.q| >= cos(threshold/2)
+    limit = math.cos(0.5 * min(max(float(threshold), 0.0), math.pi))
+    parts = {}
+
+    def kernel(r0, r1) :
+        res = []
+        for c0 in range(0, m, cols) :
+            c1 = min(c0 + cols, m)
+            d = _absDots(np, pa, qa, r0, r1, c0, c1)
+            mask = d >= limit if below else d <= limit
+            ri, ci = np.nonzero(mask)
+            res.append((ri + r0, ci + c0, _angles(np, d[ri, ci])))
+        parts[r0] = res
+
+    batch.forEachChunk(kernel, n, rows, workers)
+
+    # blocks of rows in order, within a block the tiles must be sorted by rows
+    ri, ci, ang = [], [], []
+    for r0 in sorted(parts) :
+        block = parts[r0]
+        bri = np.concatenate([ b[0] for b in block ]) if block else np.empty(0, dtype=int)
+        bci = np.concatenate([ b[1] for b in block ]) if block else np.empty(0, dtype=int)
+        bang = np.concatenate([ b[2] for b in block ]) if block else np.empty(0)
+        order = np.lexsort((bci, bri))
+        ri.append(bri[order])
+        ci.append(bci[order])
+        ang.append(bang[order])
+    if not ri :
+        return np.empty(0, dtype=int), np.empty(0, dtype=int), np.empty(0)
+    return np.concatenate(ri), np.concatenate(ci), np.concatenate(ang)
+
+
+def pairwiseTopK(p, q=None, k=1, memoryLimit=DEFAULT_MEMORY_LIMIT, workers=1) :
+    """
+    The 'k' nearest rotations of 'q' (by the angular distance) for each rotation of 'p'.
+
+    Input:
+    p - an array of shape (N,4) with rotation quaternions
+    q - an array of shape (M,4) with rotation quaternions (default: 'p')
+    k - number of nearest rotations per row, at most M (default: 1)
+    memoryLimit - limit (in bytes) of tiles' working memory (default: DEFAULT_MEMORY_LIMIT)
+    workers - number of threads, None for the number of CPUs (default: 1)
+
+    Return:
+    a tuple of arrays (indices, distances), both of shape (N,k), where
+    indices[n] are indices of rows of 'q', nearest to p[n], sorted by
+    increasing distances[n]
+
+    An AngularDistanceException is raised if any argument is invalid.
+    """
+    np, pa, qa = _prepare(p, q)
+    n, m = pa.shape[0], qa.shape[0]
+    if not isinstance(k, numbers.Integral) or k < 1 or k > m :
+        raise AngularDistanceException("'k' must be an integer between 1 and M")
+    rows, cols = _tiles(n, m, memoryLimit, workers)
+    # the running best entries are a part of the working memory as well
+    rows = max(1, min(rows, rows * cols // (cols + k)))
+
+    idx = np.empty((n, k), dtype=np.intp)
+    out = np.empty((n, k))
+
+    def kernel(r0, r1) :
+        # running best (largest) |p.q| and their column indices
+        bestd = np.full((r1 - r0, k), -1.0)
+        besti = np.full((r1 - r0, k), -1, dtype=np.intp)
+        for c0 in range(0, m, cols) :
+            c1 = min(c0 + cols, m)
+            d = _absDots(np, pa, qa, r0, r1, c0, c1)
+            candd = np.concatenate((bestd, d), axis=1)
+            candi = np.concatenate(
+                (besti, np.broadcast_to(np.arange(c0, c1), d.shape)), axis=1 )
+            sel = np.argpartition(-candd, k - 1, axis=1)[:, :k]
+            bestd = np.take_along_axis(candd, sel, axis=1)
+            besti = np.take_along_axis(candi, sel, axis=1)
+        order = np.argsort(-bestd, axis=1, kind="stable")
+        idx[r0:r1] = np.take_along_axis(besti, order, axis=1)
+        _angles(np, np.take_along_axis(bestd, order, axis=1), out[r0:r1])
+
+    batch.forEachChunk(kernel, n, rows, workers)
+    return idx, out
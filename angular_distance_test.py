@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+
+# Copyright 2013, Jernej Kovacic
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+import sys
+import numpy as np
+from rotation import Rotation
+from random_rotation import RandomRotationGenerator
+import angular_distance
+from angular_distance import AngularDistanceException
+
+
+"""
+A collection of unit tests for angular distances,
+implemented by the module angular_distance.
+"""
+
+try :
+    a = Rotation(rz=1, angle=Rotation.deg2rad(10)).getRotationQuaternion()
+    b = Rotation(rz=1, angle=Rotation.deg2rad(50)).getRotationQuaternion()
+    print("Distance: {0} deg (expected: 40 deg)".format(
+        Rotation.rad2deg(angular_distance.distance(a, b))))
+    print("Distance to -q: {0} deg (expected: 40 deg)".format(
+        Rotation.rad2deg(angular_distance.distance(a, -b))))
+    print()
+
+    gen = RandomRotationGenerator(seed=7)
+    p = gen.uniform(500)
+    q = gen.uniform(300)
+    q[::2] *= -1.0
+    full = 2.0 * np.arccos(np.minimum(np.abs(p.dot(q.T)), 1.0))
+    # a tiny memory limit forces many small tiles
+    dense = angular_distance.pairwise(p, q, memoryLimit=100000, workers=3)
+    print("Dense: max. difference from a direct computation: {0}".format(np.abs(dense - full).max()))
+
+    thr = 0.5
+    ri, ci, ang = angular_distance.pairwiseThreshold(p, q, thr, memoryLimit=100000, workers=3)
+    exp = np.nonzero(full <= thr)
+    print("Below threshold: {0} pairs (expected: {1}), same pairs: {2}".format(
+        ri.size, exp[0].size, np.array_equal(ri, exp[0]) and np.array_equal(ci, exp[1])))
+    ri, ci, ang = angular_distance.pairwiseThreshold(p, q, 3.0, below=False)
+    print("Above threshold: {0} pairs (expected: {1})".format(ri.size, np.count_nonzero(full >= 3.0)))
+
+    idx, dist = angular_distance.pairwiseTopK(p, q, 5, memoryLimit=100000, workers=3)
+    exp = np.sort(full, axis=1)[:, :5]
+    print("Top 5: max. difference of distances: {0}".format(np.abs(dist - exp).max()))
+    print("Top 5: indices consistent: {0}".format(
+        np.allclose(np.take_along_axis(full, idx, axis=1), dist)))
+
+except AngularDistanceException as ex:
+    print("\nAngular distance exception raised: '{0}'".format(ex), file=sys.stderr)
+else :
+    print("\nAngular distance test completed successfully.")
@@ -0,0 +1,437 @@
+# Copyright 2013, Jernej Kovacic
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+A module with a registry of compute backends for batch operations.
+
+Two backends are available:
+- "python": pure Python, based on quaternion.Quaternion, batches are
+            lists of rows (lists or tuples)
+- "numpy": vectorized kernels, batches are NumPy arrays
+
+Heavy dependencies (e.g. NumPy) are imported lazily, when a backend
+is used for the first time, so importing this module is cheap.
+
+The active backend is selected by setBackend() or by the environment
+variable QUATROT_BACKEND. If neither is given, "numpy" is selected
+when NumPy is installed and "python" otherwise.
+
+Author: Jernej Kovacic
+"""
+
+import importlib
+import importlib.util
+import math
+import os
+import threading
+
+import exception
+from quaternion import Quaternion
+
+
+class BackendException(exception.IException) :
+    """Exception raised at illegal backend operations"""
+    pass
+
+
+class IBackend() :
+    """
+    An "interface" for compute backends.
+
+    Quaternions are represented by rows with 4 elements, ordered as
+    (scalar, i, j, k), and points by rows with 3 elements. All kernels
+    process rows in [lo, hi) and write results into 'out'.
+    """
+
+    """Name of the backend, used by the registry"""
+    name = None
+
+    """Do kernels release the GIL, i.e. does splitting among threads pay off"""
+    threaded = False
+
+    def version(self) :
+        """Returns a string, identifying the backend's implementation"""
+        raise NotImplementedError
+
+    def asArray(self, a, cols) :
+        """
+        Converts 'a' into a batch with 'cols' columns.
+        A single row is converted into a batch with one row.
+
+        A BackendException is raised if 'a' does not have 'cols' columns.
+        """
+        raise NotImplementedError
+
+    def rows(self, a) :
+        """Returns number of rows of the batch 'a'"""
+        return len(a)
+
+    def empty(self, n, cols) :
+        """Returns an uninitialized batch with 'n' rows and 'cols' columns"""
+        raise NotImplementedError
+
+    def rotationMatrix(self, q) :
+        """Returns the rotation matrix of a quaternion 'q' (Quaternion)"""
+        raise NotImplementedError
+
+    def multiply(self, p, q, out, lo, hi) :
+        """
+        Quaternion products of rows of 'p' and 'q'. A batch with
+        a single row is multiplied by all rows of the other one.
+        """
+        raise NotImplementedError
+
+    def rotate(self, m, pts, out, lo, hi) :
+        """Multiplies rows of 'pts' by the rotation matrix 'm'"""
+        raise NotImplementedError
+
+    def rotateEach(self, q, pts, out, lo, hi) :
+        """
+        Rotates each row of 'pts' by the corresponding unit quaternion of 'q'.
+        A batch with a single row is paired with all rows of the other one.
+        """
+        raise NotImplementedError
+
+    def renormalize(self, q, tol, out, lo, hi) :
+        """
+        Renormalizes rows of 'q', see Quaternion.renormalize. 'out' may be 'q'.
+
+        Return:
+        a tuple (maxDeviation, fallbacks) with the worst deviation
+        |norm^2 - 1| and number of exactly normalized rows
+
+        A BackendException is raised if any row is a zero-quaternion.
+        """
+        raise NotImplementedError
+
+    def transform(self, m, t, pts, out, lo, hi) :
+        """
+        Rigid transform of rows of 'pts', i.e. multiplication by the rotation
+        matrix 'm', followed by addition of the translation 't' (3 floats)
+        """
+        raise NotImplementedError
+
+
+class PythonBackend(IBackend) :
+    """
+    Pure Python backend, based on quaternion.Quaternion.
+    It has no dependencies beyond the standard library.
+    """
+
+    name = "python"
+    threaded = False
+
+    def version(self) :
+        return "python"
+
+    def asArray(self, a, cols) :
+        if Quaternion.isQuaternion(a) and cols == 4 :
+            return [ (a.o, a.i, a.j, a.k) ]
+        try :
+            rows = list(a)
+            if rows and not hasattr(rows[0], "__len__") :
+                rows = [ rows ]
+            rows = [ tuple(float(x) for x in r) for r in rows ]
+        except (TypeError, ValueError) :
+            raise BackendException("Invalid batch")
+        for r in rows :
+            if len(r) != cols :
+                raise BackendException("Batch must have {0} columns".format(cols))
+        return rows
+
+    def empty(self, n, cols) :
+        return [ None ] * n
+
+    def rotationMatrix(self, q) :
+        return q.rotationMatrix()
+
+    def multiply(self, p, q, out, lo, hi) :
+        np1 = len(p) != 1
+        nq1 = len(q) != 1
+        for r in range(lo, hi) :
+            pq = Quaternion(*p[r if np1 else 0]) * Quaternion(*q[r if nq1 else 0])
+            out[r] = (pq.o, pq.i, pq.j, pq.k)
+
+    def rotate(self, m, pts, out, lo, hi) :
+        m0, m1, m2 = m
+        for r in range(lo, hi) :
+            x, y, z = pts[r]
+            out[r] = (
+                m0[0]*x + m0[1]*y + m0[2]*z,
+                m1[0]*x + m1[1]*y + m1[2]*z,
+                m2[0]*x + m2[1]*y + m2[2]*z )
+
+    def rotateEach(self, q, pts, out, lo, hi) :
+        nq1 = len(q) != 1
+        np1 = len(pts) != 1
+        for r in range(lo, hi) :
+            o, ux, uy, uz = q[r if nq1 else 0]
+            vx, vy, vz = pts[r if np1 else 0]
+            # v' = v + o*t + u x t, where t = 2 * u x v
+            tx = 2.0 * (uy*vz - uz*vy)
+            ty = 2.0 * (uz*vx - ux*vz)
+            tz = 2.0 * (ux*vy - uy*vx)
+            out[r] = (
+                vx + o*tx + (uy*tz - uz*ty),
+                vy + o*ty + (uz*tx - ux*tz),
+                vz + o*tz + (ux*ty - uy*tx) )
+
+    def renormalize(self, q, tol, out, lo, hi) :
+        maxDev, fallbacks = 0.0, 0
+        for r in range(lo, hi) :
+            o, i, j, k = q[r]
+            nsq = o*o + i*i + j*j + k*k
+            dev = abs(nsq - 1.0)
+            if dev != dev :
+                # a non-finite row, never within the tolerance
+                dev = float("inf")
+            if dev <= tol :
+                f = 0.5 * (3.0 - nsq)
+            else :
+                if nsq < Quaternion.eps :
+                    raise BackendException("Cannot normalize a zero-quaternion")
+                f = 1.0 / math.sqrt(nsq)
+                fallbacks += 1
+            maxDev = max(maxDev, dev)
+            out[r] = (o*f, i*f, j*f, k*f)
+        return maxDev, fallbacks
+
+    def transform(self, m, t, pts, out, lo, hi) :
+        m0, m1, m2 = m
+        tx, ty, tz = t
+        for r in range(lo, hi) :
+            x, y, z = pts[r]
+            out[r] = (
+                m0[0]*x + m0[1]*y + m0[2]*z + tx,
+                m1[0]*x + m1[1]*y + m1[2]*z + ty,
+                m2[0]*x + m2[1]*y + m2[2]*z + tz )
+
+
+class NumpyBackend(IBackend) :
+    """
+    Vectorized backend, based on NumPy. NumPy is imported
+    when the backend is used for the first time.
+    """
+
+    name = "numpy"
+    threaded = True
+
+    def __init__(self) :
+        self.__np = None
+
+    @property
+    def np(self) :
+        """The numpy module, imported on first access"""
+        if self.__np is None :
+            self.__np = _importModule("numpy")
+        return self.__np
+
+    def version(self) :
+        return "numpy-" + self.np.__version__
+
+    def asArray(self, a, cols) :
+        if Quaternion.isQuaternion(a) and cols == 4 :
+            return self.np.array([[a.o, a.i, a.j, a.k]])
+        try :
+            arr = self.np.asarray(a, dtype=float)
+        except (TypeError, ValueError) :
+            raise BackendException("Invalid batch")
+        if arr.ndim == 1 :
+            arr = arr.reshape(1, -1) if arr.size else arr.reshape(0, cols)
+        if arr.ndim != 2 or arr.shape[1] != cols :
+            raise BackendException("Batch must be an array of shape (N,{0})".format(cols))
+        return arr
+
+    def rows(self, a) :
+        return a.shape[0]
+
+    def empty(self, n, cols) :
+        return self.np.empty((n, cols))
+
+    def rotationMatrix(self, q) :
+        return self.np.array(q.rotationMatrix())
+
+    def multiply(self, p, q, out, lo, hi) :
+        # For the formula, see Quaternion.__mul__
+        p = p[lo:hi] if p.shape[0] != 1 else p
+        q = q[lo:hi] if q.shape[0] != 1 else q
+        out = out[lo:hi]
+        a1, b1, c1, d1 = p[:, 0], p[:, 1], p[:, 2], p[:, 3]
+        a2, b2, c2, d2 = q[:, 0], q[:, 1], q[:, 2], q[:, 3]
+        out[:, 0] = a1*a2 - b1*b2 - c1*c2 - d1*d2
+        out[:, 1] = a1*b2 + b1*a2 + c1*d2 - d1*c2
+        out[:, 2] = a1*c2 - b1*d2 + c1*a2 + d1*b2
+        out[:, 3] = a1*d2 + b1*c2 - c1*b2 + d1*a2
+
+    def rotate(self, m, pts, out, lo, hi) :
+        self.np.matmul(pts[lo:hi], m.T, out=out[lo:hi])
+
+    def rotateEach(self, q, pts, out, lo, hi) :
+        # Operands may have any number of leading dimensions that broadcast
+        # against each other, the chunk is taken along the first one.
+        np = self.np
+        q = q[lo:hi] if q.shape[0] != 1 else q
+        pts = pts[lo:hi] if pts.shape[0] != 1 else pts
+        out = out[lo:hi]
+        o, ux, uy, uz = q[..., 0], q[..., 1], q[..., 2], q[..., 3]
+        vx, vy, vz = pts[..., 0], pts[..., 1], pts[..., 2]
+        # v' = v + o*t + u x t, where t = 2 * u x v
+        tx = uy*vz - uz*vy
+        ty = uz*vx - ux*vz
+        tz = ux*vy - uy*vx
+        tx *= 2.0
+        ty *= 2.0
+        tz *= 2.0
+        np.add(vx, o*tx + (uy*tz - uz*ty), out=out[..., 0])
+        np.add(vy, o*ty + (uz*tx - ux*tz), out=out[..., 1])
+        np.add(vz, o*tz + (ux*ty - uy*tx), out=out[..., 2])
+
+    def renormalize(self, q, tol, out, lo, hi) :
+        np = self.np
+        q = q[lo:hi]
+        if q.shape[0] == 0 :
+            return 0.0, 0
+        nsq = np.einsum("ij,ij->i", q, q)
+        dev = np.abs(nsq - 1.0)
+        # (3 - nsq)/2 near unit norm, the exact factor elsewhere
+        f = 0.5 * (3.0 - nsq)
+        # NaN rows are not within the tolerance either
+        far = ~(dev <= tol)
+        fallbacks = int(np.count_nonzero(far))
+        if fallbacks :
+            nf = nsq[far]
+            # NaN rows must not hide zero rows as they would from min()
+            if (nf < Quaternion.eps).any() :
+                raise BackendException("Cannot normalize a zero-quaternion")
+            f[far] = 1.0 / np.sqrt(nf)
+        np.multiply(q, f[:, None], out=out[lo:hi])
+        maxDev = float(dev.max())
+        # NaN deviations are reported as infinite, as by PythonBackend
+        return (maxDev if maxDev == maxDev else float("inf")), fallbacks
+
+    def transform(self, m, t, pts, out, lo, hi) :
+        # the chunk is still in cache when the translation is added
+        o = out[lo:hi]
+        self.np.matmul(pts[lo:hi], m.T, out=o)
+        o += t
+
+
+def _importModule(name) :
+    # Imports a backend's dependency, a BackendException is raised if not installed
+    try :
+        return importlib.import_module(name)
+    except ImportError :
+        raise BackendException("Backend requires the module '{0}'".format(name))
+
+
+# Registered backends' factories and instances, guarded by _lock
+_lock = threading.Lock()
+_factories = { PythonBackend.name : PythonBackend,
+               NumpyBackend.name : NumpyBackend }
+_requirements = { NumpyBackend.name : "numpy" }
+_instances = {}
+_active = None
+
+
+def register(name, factory, requires=None) :
+    """
+    Registers a new backend.
+
+    Input:
+    name - name of the backend
+    factory - a callable that returns an instance of IBackend
+    requires - name of a module, required by the backend (default: None)
+    """
+    with _lock :
+        _factories[name] = factory
+        if requires is None :
+            _requirements.pop(name, None)
+        else :
+            _requirements[name] = requires
+        _instances.pop(name, None)
+
+
+def available() :
+    """
+    Returns a list of names of registered backends whose
+    dependencies are installed. Dependencies are not imported.
+    """
+    with _lock :
+        names = list(_factories)
+        reqs = dict(_requirements)
+    return [ n for n in names
+             if n not in reqs or importlib.util.find_spec(reqs[n]) is not None ]
+
+
+def _instance(name) :
+    # Returns a (cached) instance of the backend 'name'
+    with _lock :
+        if name not in _factories :
+            raise BackendException("Unknown backend '{0}'".format(name))
+        be = _instances.get(name)
+        if be is None :
+            be = _factories[name]()
+            _instances[name] = be
+        return be
+
+
+def setBackend(name) :
+    """
+    Selects the active backend.
+
+    Input:
+    name - name of a registered backend (e.g. "python" or "numpy")
+
+    A BackendException is raised if the backend is not registered
+    or its dependency is not installed.
+    """
+    global _active
+    if name not in available() :
+        raise BackendException("Backend '{0}' is not available".format(name))
+    be = _instance(name)
+    with _lock :
+        _active = be
+
+
+def getBackend(name=None) :
+    """
+    Returns the backend 'name' or the active backend if 'name' is not given.
+
+    Unless set by setBackend(), the active backend is determined by the
+    environment variable QUATROT_BACKEND or, if not set, "numpy" is
+    selected when available and "python" otherwise.
+    """
+    if name is not None :
+        return _instance(name)
+
+    with _lock :
+        be = _active
+    if be is None :
+        env = os.environ.get("QUATROT_BACKEND")
+        if env :
+            setBackend(env)
+        else :
+            setBackend(NumpyBackend.name if NumpyBackend.name in available()
+                       else PythonBackend.name)
+        with _lock :
+            be = _active
+    return be
+
+
+def numpy() :
+    """
+    Returns the numpy module, imported on first call.
+    A BackendException is raised if NumPy is not installed.
+    """
+    return _instance(NumpyBackend.name).np
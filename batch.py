@@ -0,0 +1,620 @@
+# Copyright 2013, Jernej Kovacic
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+A module with batch (array based) quaternion products and 3D rotations.
+
+Quaternions are represented by rows of (N,4) batches, ordered as
+(scalar, i, j, k), and points by rows of (N,3) batches. Batches are
+processed by the active compute backend (see the module backend).
+Kernels of the NumPy backend release the GIL, so large batches are
+split into chunks that are processed concurrently by a pool of threads.
+The chunk size is determined by a one-time calibration, whose result is
+cached per machine. Batches below a size threshold are processed serially.
+
+Modules, only needed by the thread pool and the calibration, are imported
+on first use to keep the import of this module cheap.
+
+Author: Jernej Kovacic
+"""
+
+import os
+import sys
+import threading
+import time
+
+import exception
+import backend
+from quaternion import Quaternion, QuaternionException
+from rotation import Rotation, Point3D
+from instance_checker import InstanceCheck
+
+
+class BatchException(exception.IException) :
+    """Exception raised at illegal batch operations"""
+    pass
+
+
+# Candidate chunk sizes (number of rows), tried by the calibration
+_CHUNK_CANDIDATES = (4096, 8192, 16384, 32768, 65536, 131072)
+
+# Number of rows of arrays, used by the calibration
+_CALIBRATION_SIZE = 262144
+
+# Batches, smaller than this, are never split among threads
+_MIN_PARALLEL_SIZE = 16384
+
+# Minimum speedup over serial execution that justifies the thread pool
+_MIN_SPEEDUP = 1.1
+
+# Operations with calibrated parameters
+_OPERATIONS = ("multiply", "rotate", "transform", "rotateEach", "renormalize")
+
+# Version of the calibration cache file's format
+_CACHE_VERSION = 2
+
+# Shared thread pools (one per number of workers) and calibrated
+# parameters (one set per backend), guarded by _lock
+_lock = threading.Lock()
+_pools = {}
+_tuning = {}
+
+
+def workerCount() :
+    """Returns the default number of worker threads (number of CPUs)"""
+    return os.cpu_count() or 1
+
+
+def _getPool(workers) :
+    # Returns the shared thread pool with the given number of workers
+    from concurrent.futures import ThreadPoolExecutor
+    with _lock :
+        pool = _pools.get(workers)
+        if pool is None :
+            pool = ThreadPoolExecutor(max_workers=workers)
+            _pools[workers] = pool
+        return pool
+
+
+def _cacheFile() :
+    # Path of the file with cached calibration results
+    base = os.environ.get("QUATROT_CACHE_DIR")
+    if not base :
+        base = os.path.join(
+                    os.environ.get("XDG_CACHE_HOME") or
+                    os.path.join(os.path.expanduser("~"), ".cache"),
+                    "py-quat-rotation" )
+    return os.path.join(base, "batch.json")
+
+
+def _machineKey(be) :
+    # Identifies the machine (and backend's build) the calibration applies to
+    import platform
+    return "{0}/{1}/{2}/{3}".format(
+                platform.node(),
+                platform.machine(),
+                workerCount(),
+                be.version() )
+
+
+def _loadCache() :
+    # Reads all cached calibrations, an empty dictionary if not available
+    import json
+    try :
+        with open(_cacheFile(), "r") as f :
+            data = json.load(f)
+        if data.get("version") == _CACHE_VERSION :
+            return data.get("machines", {})
+    except (OSError, ValueError) :
+        pass
+    return {}
+
+
+def _storeCache(be, tuning) :
+    # Stores calibration of this machine. Failures are silently ignored
+    # as the calibration will simply be repeated next time.
+    import json
+    machines = _loadCache()
+    machines[_machineKey(be)] = tuning
+    path = _cacheFile()
+    try :
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".{0}.tmp".format(os.getpid())
+        with open(tmp, "w") as f :
+            json.dump({"version" : _CACHE_VERSION, "machines" : machines}, f)
+        os.replace(tmp, path)
+    except OSError :
+        pass
+
+
+def _run(kernel, n, chunk, threshold, workers) :
+    # Applies kernel(lo, hi) to all rows in [0, n), either serially
+    # or split into chunks, processed by the thread pool.
+    if workers <= 1 or n < threshold or n <= chunk :
+        kernel(0, n)
+        return
+
+    pool = _getPool(workers)
+    futures = [ pool.submit(kernel, lo, min(lo + chunk, n))
+                for lo in range(0, n, chunk) ]
+    for f in futures :
+        # re-raises any exception, raised by the kernel
+        f.result()
+
+
+def forEachChunk(kernel, n, chunk, workers=1) :
+    """
+    Applies kernel(lo, hi) to all chunks [lo, hi) of rows in [0, n).
+    Unlike batch operations, the rows are always split into chunks,
+    e.g. to bound the memory, needed by the kernel.
+
+    Input:
+    kernel - a function, called as kernel(lo, hi) for each chunk
+    n - number of rows
+    chunk - maximum number of rows of a chunk
+    workers - number of threads, None for the number of CPUs (default: 1)
+
+    Chunks are processed by the shared thread pool if 'workers' is
+    greater than 1, hence the kernel must be thread safe.
+
+    A BatchException is raised if 'chunk' is not positive.
+    """
+    if chunk < 1 :
+        raise BatchException("Chunk size must be a positive integer")
+    if workers is None :
+        workers = workerCount()
+    if workers <= 1 :
+        for lo in range(0, n, chunk) :
+            kernel(lo, min(lo + chunk, n))
+    else :
+        _run(kernel, n, chunk, 0, workers)
+
+
+def _bestTime(func, repeat=3) :
+    # Best wall time of 'repeat' calls of func()
+    best = float("inf")
+    for _ in range(repeat) :
+        t0 = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _calibrateKernel(kernel, workers) :
+    # Finds the fastest chunk size for kernel(lo, hi) and
+    # the batch size threshold below which the serial execution is used.
+    n = _CALIBRATION_SIZE
+    serial = _bestTime(lambda : kernel(0, n))
+
+    best, bestChunk = float("inf"), _CHUNK_CANDIDATES[0]
+    if workers > 1 :
+        for chunk in _CHUNK_CANDIDATES :
+            t = _bestTime(lambda : _run(kernel, n, chunk, 0, workers))
+            if t < best :
+                best, bestChunk = t, chunk
+
+    if best * _MIN_SPEEDUP > serial :
+        # the thread pool does not pay off on this machine
+        threshold = sys.maxsize
+    else :
+        threshold = max(_MIN_PARALLEL_SIZE, 2 * bestChunk)
+
+    return { "chunk" : bestChunk, "threshold" : threshold }
+
+
+def calibrate(force=False) :
+    """
+    Determines chunk sizes and serial thresholds of all batch operations
+    of the active backend.
+
+    The calibration is performed only once per machine, its results are
+    cached in a file and reused by subsequent processes. The cache's
+    directory may be set by the environment variable QUATROT_CACHE_DIR.
+    Backends that do not release the GIL and machines with a single CPU
+    are not calibrated as they always process batches serially.
+
+    Input:
+    force - if True, the calibration is repeated even if cached results
+            are available (default: False)
+
+    Return:
+    a dictionary with parameters ("chunk" and "threshold") of each operation
+    """
+    be = backend.getBackend()
+
+    with _lock :
+        tuning = _tuning.get(be.name)
+    if tuning is not None and not force :
+        return tuning
+
+    if not be.threaded or workerCount() <= 1 :
+        serial = { "chunk" : _CALIBRATION_SIZE, "threshold" : sys.maxsize }
+        tuning = dict( (op, serial) for op in _OPERATIONS )
+    elif not force :
+        tuning = _loadCache().get(_machineKey(be))
+        if tuning is not None and not all(op in tuning for op in _OPERATIONS) :
+            # cached by an older version with less operations
+            tuning = None
+
+    if tuning is None :
+        import random
+        workers = workerCount()
+        rng = random.Random(0)
+        n = _CALIBRATION_SIZE
+        # a small random block, repeated, is enough for timing
+        block = 1024
+        def rows(cols) :
+            r = [ tuple(rng.gauss(0.0, 1.0) for _ in range(cols)) for _ in range(block) ]
+            return be.asArray(r * (n // block), cols)
+        p = rows(4)
+        q = rows(4)
+        prod = be.empty(n, 4)
+        pts = rows(3)
+        rpts = be.empty(n, 3)
+        m = be.rotationMatrix(Quaternion(1.0, 2.0, 3.0, 4.0).unit())
+        t = (1.0, -2.0, 3.0)
+
+        kernels = {
+            "multiply" : lambda lo, hi : be.multiply(p, q, prod, lo, hi),
+            "rotate" : lambda lo, hi : be.rotate(m, pts, rpts, lo, hi),
+            "transform" : lambda lo, hi : be.transform(m, t, pts, rpts, lo, hi),
+            "rotateEach" : lambda lo, hi : be.rotateEach(p, pts, rpts, lo, hi),
+            "renormalize" : lambda lo, hi : be.renormalize(p, Quaternion.renormTolerance, prod, lo, hi) }
+        tuning = dict( (op, _calibrateKernel(kernels[op], workers))
+                       for op in _OPERATIONS )
+        _storeCache(be, tuning)
+
+    with _lock :
+        _tuning[be.name] = tuning
+    return tuning
+
+
+def _params(op, n, workers, chunk) :
+    # Number of workers, chunk size and serial threshold of the operation 'op'
+    # on a batch with 'n' rows
+    if workers is None :
+        workers = workerCount()
+    if chunk is None :
+        if n < _MIN_PARALLEL_SIZE or workers <= 1 :
+            # processed serially anyway, the calibration is not needed
+            return 1, max(1, n), sys.maxsize
+        tuned = calibrate()[op]
+        return workers, tuned["chunk"], tuned["threshold"]
+    if chunk < 1 :
+        raise BatchException("Chunk size must be a positive integer")
+    if not backend.getBackend().threaded :
+        workers = 1
+    return workers, chunk, _MIN_PARALLEL_SIZE
+
+
+def _asBatch(be, a, cols, name) :
+    # Converts 'a' into the backend's batch with 'cols' columns
+    try :
+        return be.asArray(a, cols)
+    except backend.BackendException :
+        raise BatchException("'{0}' must be a batch of shape (N,{1})".format(name, cols))
+
+
+def _checkOut(be, out, n, cols) :
+    # Returns 'out' or a new batch if it is not given
+    if out is None :
+        return be.empty(n, cols)
+    if be.rows(out) != n or getattr(out, "shape", (n, cols))[1:] != (cols,) :
+        raise BatchException("'out' must be a batch of shape (N,{0})".format(cols))
+    return out
+
+
+def rotationMatrix(q) :
+    """
+    Rotation matrix of a unit quaternion, as represented by the active backend.
+
+    Input:
+    q - a unit quaternion (an instance of Quaternion)
+
+    Return:
+    a 3x3 matrix 'm', satisfying m*p == q*p*q.conj() for any vector 'p'
+
+    A BatchException is raised if 'q' is not an instance of Quaternion
+    or if it is a zero-quaternion.
+    """
+    if not Quaternion.isQuaternion(q) :
+        raise BatchException("Input must be an instance of Quaternion")
+    try :
+        return backend.getBackend().rotationMatrix(q)
+    except QuaternionException as qex :
+        raise BatchException("Invalid rotation quaternion: '{0}'".format(qex))
+
+
+def multiply(p, q, out=None, workers=None, chunk=None) :
+    """
+    Quaternion products of corresponding rows of 'p' and 'q'.
+
+    Input:
+    p - a batch of shape (N,4), a single row or an instance of Quaternion
+    q - a batch of shape (N,4), a single row or an instance of Quaternion
+    out - an optional batch of shape (N,4) where the products are written into
+    workers - number of threads (default: number of CPUs)
+    chunk - number of rows processed by a thread at once (default: calibrated)
+
+    A single quaternion is multiplied by all rows of the other batch.
+
+    Return:
+    a batch of shape (N,4) with products p[n]*q[n]
+
+    A BatchException is raised if the batches' shapes do not match.
+    """
+    be = backend.getBackend()
+    p = _asBatch(be, p, 4, "p")
+    q = _asBatch(be, q, 4, "q")
+    npr, nq = be.rows(p), be.rows(q)
+    n = max(npr, nq)
+    if npr not in (1, n) or nq not in (1, n) :
+        raise BatchException("Numbers of quaternions do not match")
+    out = _checkOut(be, out, n, 4)
+
+    workers, chunk, threshold = _params("multiply", n, workers, chunk)
+    _run(lambda lo, hi : be.multiply(p, q, out, lo, hi),
+         n, chunk, threshold, workers)
+    return out
+
+
+def renormalize(quaternions, out=None, tolerance=None, monitor=None, workers=None, chunk=None) :
+    """
+    Renormalizes nearly unit quaternions, see Quaternion.renormalize.
+
+    Rows whose squared norms deviate from 1 by at most 'tolerance' are
+    corrected by a first order approximation without a square root,
+    other rows are normalized exactly.
+
+    Input:
+    quaternions - a batch of shape (N,4)
+    out - an optional batch of shape (N,4) where the quaternions are written
+          into, it may be 'quaternions' itself (e.g. a NumPy array of floats
+          or a list of rows) to renormalize the batch in place
+    tolerance - maximum deviation |norm^2 - 1| of the approximation
+                (default: Quaternion.renormTolerance)
+    monitor - an optional instance of DriftMonitor that records deviations
+    workers - number of threads (default: number of CPUs)
+    chunk - number of rows processed by a thread at once (default: calibrated)
+
+    Return:
+    a batch of shape (N,4) with renormalized quaternions
+
+    A BatchException is raised if any argument is invalid
+    or any row is a zero-quaternion.
+    """
+    if tolerance is None :
+        tolerance = Quaternion.renormTolerance
+    if not InstanceCheck.isFloat(tolerance) or tolerance < 0.0 :
+        raise BatchException("Tolerance must be a non-negative float")
+    be = backend.getBackend()
+    q = _asBatch(be, quaternions, 4, "quaternions")
+    n = be.rows(q)
+    out = _checkOut(be, out, n, 4)
+
+    # per chunk results, combined when all chunks are processed
+    stats = []
+    def kernel(lo, hi) :
+        stats.append(be.renormalize(q, tolerance, out, lo, hi))
+
+    workers, chunk, threshold = _params("renormalize", n, workers, chunk)
+    try :
+        _run(kernel, n, chunk, threshold, workers)
+    except backend.BackendException as bex :
+        raise BatchException("Could not renormalize: '{0}'".format(bex))
+    if monitor is not None :
+        monitor.update(n, max([ s[0] for s in stats ] or [ 0.0 ]),
+                       sum([ s[1] for s in stats ]))
+    return out
+
+
+def rotate(rot, points, out=None, workers=None, chunk=None) :
+    """
+    Rotates all points by the same rotation.
+
+    Input:
+    rot - an instance of Rotation or a unit rotation quaternion
+    points - a batch of shape (N,3), one point per row
+    out - an optional batch of shape (N,3) where the rotated points are written into
+    workers - number of threads (default: number of CPUs)
+    chunk - number of rows processed by a thread at once (default: calibrated)
+
+    Return:
+    a batch of shape (N,3) with rotated points
+
+    A BatchException is raised if any argument is invalid.
+    """
+    if isinstance(rot, Rotation) :
+        rot = rot.getRotationQuaternion()
+    m = rotationMatrix(rot)
+
+    be = backend.getBackend()
+    pts = _asBatch(be, points, 3, "points")
+    n = be.rows(pts)
+    out = _checkOut(be, out, n, 3)
+
+    workers, chunk, threshold = _params("rotate", n, workers, chunk)
+    _run(lambda lo, hi : be.rotate(m, pts, out, lo, hi),
+         n, chunk, threshold, workers)
+    return out
+
+
+def rotateInverse(rot, points, out=None, workers=None, chunk=None) :
+    """
+    Rotates all points by the inverse of the same rotation, i.e. undoes rotate().
+
+    The points are multiplied by the transpose of the rotation matrix,
+    so the inverse rotation costs the same as the forward one.
+
+    Input:
+    rot - an instance of Rotation or a unit rotation quaternion
+    points - a batch of shape (N,3), one point per row
+    out - an optional batch of shape (N,3) where the rotated points are written into
+    workers - number of threads (default: number of CPUs)
+    chunk - number of rows processed by a thread at once (default: calibrated)
+
+    Return:
+    a batch of shape (N,3) with rotated points
+
+    A BatchException is raised if any argument is invalid.
+    """
+    if isinstance(rot, Rotation) :
+        rot = rot.getRotationQuaternion()
+    m = rotationMatrix(rot)
+    # a NumPy array or a tuple of rows
+    m = m.T if hasattr(m, "T") else tuple(zip(*m))
+
+    be = backend.getBackend()
+    pts = _asBatch(be, points, 3, "points")
+    n = be.rows(pts)
+    out = _checkOut(be, out, n, 3)
+
+    workers, chunk, threshold = _params("rotate", n, workers, chunk)
+    _run(lambda lo, hi : be.rotate(m, pts, out, lo, hi),
+         n, chunk, threshold, workers)
+    return out
+
+
+def _translation(t) :
+    # Converts a Point3D or a sequence with 3 elements into a tuple of 3 floats
+    if Point3D.isPoint3D(t) :
+        return (float(t.x), float(t.y), float(t.z))
+    try :
+        tx, ty, tz = t
+        return (float(tx), float(ty), float(tz))
+    except (TypeError, ValueError) :
+        raise BatchException("Translation must be a Point3D or 3 floats")
+
+
+def transform(rot, translation, points, out=None, workers=None, chunk=None) :
+    """
+    Applies the same rigid transform (a rotation, followed by a translation)
+    to all points in a single pass.
+
+    Input:
+    rot - an instance of Rotation or a unit rotation quaternion
+    translation - an instance of Point3D or a sequence of 3 floats
+    points - a batch of shape (N,3), one point per row
+    out - an optional batch of shape (N,3) where the transformed points are written into
+    workers - number of threads (default: number of CPUs)
+    chunk - number of rows processed by a thread at once (default: calibrated)
+
+    Return:
+    a batch of shape (N,3) with transformed points
+
+    A BatchException is raised if any argument is invalid.
+    """
+    if isinstance(rot, Rotation) :
+        rot = rot.getRotationQuaternion()
+    m = rotationMatrix(rot)
+    t = _translation(translation)
+
+    be = backend.getBackend()
+    pts = _asBatch(be, points, 3, "points")
+    n = be.rows(pts)
+    out = _checkOut(be, out, n, 3)
+
+    workers, chunk, threshold = _params("transform", n, workers, chunk)
+    _run(lambda lo, hi : be.transform(m, t, pts, out, lo, hi),
+         n, chunk, threshold, workers)
+    return out
+
+
+def rotateEach(quaternions, points, out=None, outer=False, workers=None, chunk=None) :
+    """
+    Rotates each point by its own rotation quaternion.
+
+    Input:
+    quaternions - a batch of unit rotation quaternions of shape (...,4)
+    points - a batch of points of shape (...,3)
+    out - an optional batch where the rotated points are written into
+    outer - if True, each point is rotated by each quaternion, e.g.
+            (N,4) and (M,3) give (N,M,3) (default: False)
+    workers - number of threads (default: number of CPUs)
+    chunk - number of points processed by a thread at once (default: calibrated)
+
+    Leading dimensions of both batches are broadcast against each other
+    by NumPy's broadcasting rules, e.g. (N,4) and (N,3) give (N,3),
+    (N,1,4) and (M,3) give (N,M,3). A single quaternion or point is
+    treated as a batch with one row. The quaternions are not normalized.
+
+    The pure Python backend only supports batches of shapes (N,4) and (N,3)
+    (or a single row) without the 'outer' option.
+
+    Return:
+    a batch of rotated points
+
+    A BatchException is raised if the shapes cannot be broadcast or
+    any argument is invalid.
+    """
+    be = backend.getBackend()
+
+    if not be.threaded :
+        if outer :
+            raise BatchException("Option 'outer' requires the NumPy backend")
+        q = _asBatch(be, quaternions, 4, "quaternions")
+        pts = _asBatch(be, points, 3, "points")
+        nq, npt = be.rows(q), be.rows(pts)
+        n = max(nq, npt)
+        if nq not in (1, n) or npt not in (1, n) :
+            raise BatchException("Numbers of quaternions and points do not match")
+        out = _checkOut(be, out, n, 3)
+        workers, chunk, threshold = _params("rotateEach", n, workers, chunk)
+        _run(lambda lo, hi : be.rotateEach(q, pts, out, lo, hi),
+             n, chunk, threshold, workers)
+        return out
+
+    np = be.np
+    try :
+        q = np.asarray(quaternions, dtype=float)
+        pts = np.asarray(points, dtype=float)
+    except (TypeError, ValueError) :
+        raise BatchException("Invalid batch")
+    if q.ndim == 0 or q.shape[-1] != 4 :
+        raise BatchException("'quaternions' must be a batch of shape (...,4)")
+    if pts.ndim == 0 or pts.shape[-1] != 3 :
+        raise BatchException("'points' must be a batch of shape (...,3)")
+    if q.ndim == 1 :
+        q = q.reshape(1, 4)
+    if pts.ndim == 1 :
+        pts = pts.reshape(1, 3)
+    if outer :
+        q = q.reshape(q.shape[:-1] + (1,) * (pts.ndim - 1) + (4,))
+
+    # pad leading dimensions, so both operands can be sliced along the first one
+    nd = max(q.ndim, pts.ndim)
+    q = q.reshape((1,) * (nd - q.ndim) + q.shape)
+    pts = pts.reshape((1,) * (nd - pts.ndim) + pts.shape)
+    try :
+        lead = np.broadcast_shapes(q.shape[:-1], pts.shape[:-1])
+    except ValueError :
+        raise BatchException("Shapes {0} and {1} cannot be broadcast".format(q.shape, pts.shape))
+    shape = lead + (3,)
+
+    if out is None :
+        out = np.empty(shape)
+    elif getattr(out, "shape", None) != shape :
+        raise BatchException("'out' must be a batch of shape {0}".format(shape))
+
+    # chunks are taken along the first dimension, each row has 'rowSize' points
+    n = shape[0]
+    rowSize = 1
+    for dim in lead[1:] :
+        rowSize *= dim
+    workers, chunk, threshold = _params("rotateEach", n * rowSize, workers, chunk)
+    if n * rowSize < threshold :
+        workers = 1
+    _run(lambda lo, hi : be.rotateEach(q, pts, out, lo, hi),
+         n, max(1, chunk // max(1, rowSize)), 0, workers)
+    return out
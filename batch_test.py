@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+
+# Copyright 2013, Jernej Kovacic
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+import sys
+import numpy as np
+from quaternion import Quaternion, QuaternionException, DriftMonitor
+from rotation import Rotation, RotationException, Point3D
+import backend
+from backend import BackendException
+import batch
+from batch import BatchException
+
+
+"""
+A collection of unit tests for batch quaternion products and rotations,
+implemented by the module batch.
+"""
+
+try :
+    print("Calibrated parameters: {0}".format(batch.calibrate()))
+    print()
+
+    p = Quaternion(-3, 1, 2, -1)
+    q = Quaternion(1, -2, 3, -4)
+    prod = batch.multiply([[-3, 1, 2, -1]], [[1, -2, 3, -4]])
+    print("p*q = {0} (correct: {1})".format(prod[0], p*q))
+    print()
+
+    rng = np.random.default_rng(1)
+    n = 100000
+    pa = rng.standard_normal((n, 4))
+    qa = rng.standard_normal((n, 4))
+    serial = batch.multiply(pa, qa, workers=1)
+    threaded = batch.multiply(pa, qa, workers=4, chunk=4096)
+    r = n // 2
+    ref = Quaternion(*pa[r]) * Quaternion(*qa[r])
+    print("Row {0}: {1} (correct: {2})".format(r, threaded[r], ref))
+    print("Max. difference between serial and threaded products: {0}".format(
+        np.abs(serial - threaded).max()))
+    print()
+
+    rot = Rotation(2, -3, 1, Rotation.deg2rad(30))
+    pts = batch.rotate(rot, [[7, 2, -5], [1, 1, 1]])
+    print("( 7, 2, -5 ) --> {0}".format(pts[0]))
+    print("Expected: (7.856793583014213, 3.917644837685909, -0.9606526529707)")
+
+    pts = rng.standard_normal((n, 3))
+    rpts = batch.rotate(rot, pts, workers=4, chunk=8192)
+    tp = rot.rotate(Point3D(*pts[r]))
+    print("Row {0}: {1}".format(r, rpts[r]))
+    print("Expected: ({0}, {1}, {2})".format(tp.x, tp.y, tp.z))
+    print("Max. error of rotated norms: {0}".format(
+        np.abs(np.linalg.norm(rpts, axis=1) - np.linalg.norm(pts, axis=1)).max()))
+    print()
+
+    from random_rotation import RandomRotationGenerator
+    qs = RandomRotationGenerator(seed=5).uniform(n)
+    each = batch.rotateEach(qs, pts, workers=4, chunk=8192)
+    tp = Rotation.fromQuaternion(Quaternion(*qs[r])).rotate(Point3D(*pts[r]))
+    print("Each point rotated by its own quaternion, row {0}: {1}".format(r, each[r]))
+    print("Expected: ({0}, {1}, {2})".format(tp.x, tp.y, tp.z))
+    outer = batch.rotateEach(qs[:40], pts[:70], outer=True)
+    ref = np.stack([ batch.rotate(Quaternion(*qq), pts[:70]) for qq in qs[:40] ])
+    print("Outer: shape {0} (expected: (40, 70, 3)), max. error {1}".format(
+        outer.shape, np.abs(outer - ref).max()))
+    buf = np.empty((40, 70, 3))
+    res = batch.rotateEach(qs[:40, None, :], pts[:70], out=buf)
+    print("Broadcast into 'out': same buffer {0}, max. error {1}".format(
+        res is buf, np.abs(buf - ref).max()))
+    print()
+
+    mon = DriftMonitor()
+    drift = qs * (1.0 + rng.uniform(-2e-5, 2e-5, (n, 1)))
+    drift[:10] *= 3.0
+    ren = batch.renormalize(drift, monitor=mon, workers=4, chunk=8192)
+    print("Renormalized: max. |norm-1| = {0}".format(np.abs(np.linalg.norm(ren, axis=1) - 1.0).max()))
+    batch.renormalize(drift, out=drift)
+    print("In place: max. difference {0}".format(np.abs(drift - ren).max()))
+    print("Drift: {0} quaternions, max. deviation {1}, {2} exact (expected: {3}, 8, 10)".format(
+        mon.getCount(), mon.getMaxDeviation(), mon.getFallbackCount(), n))
+    for name in ("numpy", "python") :
+        backend.setBackend(name)
+        mon = DriftMonitor()
+        batch.renormalize([[1, 0, 0, 0], [float("nan"), 0, 0, 0]], monitor=mon)
+        print("NaN row, {0} backend: max. deviation {1}, {2} exact (expected: inf, 1)".format(
+            name, mon.getMaxDeviation(), mon.getFallbackCount()))
+        try :
+            batch.renormalize([[float("nan"), 0, 0, 0], [0, 0, 0, 0]])
+            print("NaN and zero rows, {0} backend: no exception raised".format(name))
+        except BatchException as ex :
+            print("NaN and zero rows, {0} backend: exception raised as expected: {1}".format(name, ex))
+    backend.setBackend("numpy")
+    print()
+
+    print("Available backends: {0}".format(backend.available()))
+    backend.setBackend("python")
+    print("Active backend: {0}".format(backend.getBackend().name))
+    prod = batch.multiply(p, [[1, -2, 3, -4], [0, 1, 0, 0]])
+    print("p*q = {0} (correct: {1})".format(prod[0], p*q))
+    print("p*i = {0} (correct: {1})".format(prod[1], p*Quaternion(i=1)))
+    pts = batch.rotate(rot, [[7, 2, -5]])
+    print("( 7, 2, -5 ) --> {0}".format(pts[0]))
+    print("Expected: (7.856793583014213, 3.917644837685909, -0.9606526529707)")
+    each = batch.rotateEach([[0.5, 0.5, 0.5, 0.5], [1, 0, 0, 0]], [1, 2, 3])
+    print("Each: {0}, {1} (expected: (3, 1, 2), (1, 2, 3))".format(each[0], each[1]))
+    rows = [[0.5, 0.5, 0.5, 0.50001], [1, 2, 2, 4]]
+    batch.renormalize(rows, out=rows)
+    print("Renormalized in place: {0} (expected: (0.2, 0.4, 0.4, 0.8))".format(rows))
+    back = batch.rotateInverse(rot, pts)
+    print("Inverse of ( 7, 2, -5 ) rotation: {0} (expected: (7, 2, -5))".format(back[0]))
+    backend.setBackend("numpy")
+
+except BackendException as ex:
+    print("\nBackend exception raised: '{0}'".format(ex), file=sys.stderr)
+except BatchException as ex:
+    print("\nBatch exception raised: '{0}'".format(ex), file=sys.stderr)
+except RotationException as ex:
+    print("\nRotation exception raised: '{0}'".format(ex), file=sys.stderr)
+except QuaternionException as ex:
+    print("\nQuaternion exception raised: '{0}'".format(ex), file=sys.stderr)
+else :
+    print("\nBatch test completed successfully.")
@@ -0,0 +1,329 @@
+# Copyright 2013, Jernej Kovacic
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+A module with implemented dual quaternion arithmetics and rigid
+transforms (rotations followed by translations), based on dual quaternions.
+
+Author: Jernej Kovacic
+"""
+
+import math
+import exception
+import batch
+from quaternion import Quaternion, QuaternionException
+from rotation import Rotation, RotationException, Point3D
+from instance_checker import InstanceCheck
+
+
+class DualQuaternionException(exception.IException) :
+    """Exception raised at illegal dual quaternion operations"""
+    pass
+
+
+class DualQuaternion() :
+    """
+    This class implements dual quaternions, i.e. r + eps*d, where 'r'
+    (the real part) and 'd' (the dual part) are quaternions and eps*eps = 0.
+
+    A unit dual quaternion represents a rigid transform: a rotation,
+    represented by the rotation quaternion 'r', followed by a translation 't',
+    where d = 0.5 * t * r. For more information, see:
+    http://en.wikipedia.org/wiki/Dual_quaternion
+    """
+
+    # Internal instance members:
+    # r - the real part (Quaternion)
+    # d - the dual part (Quaternion)
+
+    def __init__(self, r=None, d=None) :
+        """
+        A "constructor" that creates an instance of a dual quaternion.
+
+        Input:
+        r - the real part (an instance of Quaternion, default: 1)
+        d - the dual part (an instance of Quaternion, default: 0)
+
+        Alternatively 'r' may be a dual quaternion. In this case, its parts
+        are copied into self's ones and 'd' is ignored.
+
+        A DualQuaternionException is raised if any argument is not
+        an instance of Quaternion.
+        """
+        if DualQuaternion.isDualQuaternion(r) :
+            r, d = r.r, r.d
+        if r is None :
+            r = Quaternion(1.0)
+        if d is None :
+            d = Quaternion()
+        if not (Quaternion.isQuaternion(r) and Quaternion.isQuaternion(d)) :
+            raise DualQuaternionException("Invalid input arguments")
+
+        self.r = Quaternion(r)
+        self.d = Quaternion(d)
+
+    def getReal(self) :
+        """Returns the real part (a copy, an instance of Quaternion)"""
+        return Quaternion(self.r)
+
+    def getDual(self) :
+        """Returns the dual part (a copy, an instance of Quaternion)"""
+        return Quaternion(self.d)
+
+    def __add__(self, q) :
+        """Sum of two dual quaternions (a new instance of DualQuaternion)"""
+        if not DualQuaternion.isDualQuaternion(q) :
+            raise DualQuaternionException("Input must be a dual quaternion")
+        return DualQuaternion(self.r + q.r, self.d + q.d)
+
+    def __sub__(self, q) :
+        """Difference of two dual quaternions (a new instance of DualQuaternion)"""
+        if not DualQuaternion.isDualQuaternion(q) :
+            raise DualQuaternionException("Input must be a dual quaternion")
+        return DualQuaternion(self.r - q.r, self.d - q.d)
+
+    def __mul__(self, q) :
+        """
+        Implementation of the multiplication operator '*' of two dual quaternions.
+        Note that the multiplication is not commutative.
+
+        If both dual quaternions represent rigid transforms, the product
+        represents their composition: 'q' is applied first, followed by 'self'.
+
+        Input:
+        q - dual quaternion or a float value to be multiplied by this one
+
+        Return:
+        a new instance of DualQuaternion
+
+        A DualQuaternionException is raised if 'q' is not an instance of
+        DualQuaternion, float or int.
+        """
+
+        # (r1 + eps*d1) * (r2 + eps*d2) = r1*r2 + eps*(r1*d2 + d1*r2)
+
+        if DualQuaternion.isDualQuaternion(q) :
+            return DualQuaternion(self.r * q.r, self.r * q.d + self.d * q.r)
+        try :
+            return DualQuaternion(self.r * q, self.d * q)
+        except QuaternionException :
+            raise DualQuaternionException("Input must be a dual quaternion or a float")
+
+    def conj(self) :
+        """Quaternion conjugation of both parts, i.e. r* + eps*d*"""
+        return DualQuaternion(self.r.conj(), self.d.conj())
+
+    def inverse(self) :
+        """
+        Inverse of a dual quaternion, i.e. (r + eps*d)^(-1) = r^(-1) - eps*r^(-1)*d*r^(-1).
+        If 'self' represents a rigid transform, the inverse represents its inverse transform.
+
+        A DualQuaternionException is raised if the real part equals 0.
+        """
+        try :
+            ri = self.r.reciprocal()
+        except QuaternionException :
+            raise DualQuaternionException("Inverse of a dual quaternion with a zero real part does not exist")
+        return DualQuaternion(ri, -(ri * self.d * ri))
+
+    def unit(self) :
+        """
+        A unit dual quaternion of 'self', i.e. its real part is a unit quaternion
+        and the dual part is orthogonal to it.
+
+        A DualQuaternionException is raised if the real part equals 0.
+        """
+        n = self.r.norm()
+        if n < Quaternion.eps :
+            raise DualQuaternionException("Cannot normalize a dual quaternion with a zero real part")
+        r = self.r * (1.0 / n)
+        d = self.d * (1.0 / n)
+
+        # remove the component of 'd', parallel to 'r'
+        dot = r.o*d.o + r.i*d.i + r.j*d.j + r.k*d.k
+        return DualQuaternion(r, d - r * dot)
+
+    def __rigid(self) :
+        # The unit rotation quaternion and the translation (Point3D) of the
+        # rigid transform. All transform methods use it, so a non-unit dual
+        # quaternion represents the same transform as its unit dual quaternion.
+        u = self.unit()
+        t = u.d * u.r.conj() * 2.0
+        return u.r, Point3D(t.i, t.j, t.k)
+
+    def getTranslation(self) :
+        """
+        Returns the translation of a rigid transform (an instance of Point3D),
+        i.e. the vector part of 2 * d * r* of the unit dual quaternion.
+
+        A DualQuaternionException is raised if the real part equals 0.
+        """
+        return self.__rigid()[1]
+
+    def getRotation(self) :
+        """
+        Returns the rotation of a rigid transform (an instance of Rotation).
+
+        A DualQuaternionException is raised if the real part equals 0.
+        """
+        try :
+            return Rotation.fromQuaternion(self.r)
+        except RotationException as rex :
+            raise DualQuaternionException("Invalid rotation: '{0}'".format(rex))
+
+    def transform(self, p) :
+        """
+        Applies the rigid transform to the point 'p'.
+
+        Input:
+        - p - a point to be transformed (an instance of Point3D)
+
+        Returns coordinates of the transformed point (an instance of Point3D).
+
+        The dual quaternion does not need to be a unit one.
+
+        A DualQuaternionException is raised if 'p' is not an instance of Point3D
+        or the real part equals 0.
+        """
+        if not Point3D.isPoint3D(p) :
+            raise DualQuaternionException("Input must be an instance of Point3D")
+        r, t = self.__rigid()
+        pq = r * Quaternion(0.0, p.x, p.y, p.z) * r.conj()
+        return Point3D(pq.i + t.x, pq.j + t.y, pq.k + t.z)
+
+    def transformPoints(self, points, out=None, workers=None, chunk=None) :
+        """
+        Applies the rigid transform to all points in a single pass,
+        see batch.transform.
+
+        Input:
+        points - a batch of shape (N,3), one point per row
+        out - an optional batch of shape (N,3) where the transformed points are written into
+        workers - number of threads (default: number of CPUs)
+        chunk - number of rows processed by a thread at once (default: calibrated)
+
+        Return:
+        a batch of shape (N,3) with transformed points
+
+        The dual quaternion does not need to be a unit one.
+
+        A DualQuaternionException is raised if any argument is invalid
+        or the real part equals 0.
+        """
+        r, t = self.__rigid()
+        try :
+            return batch.transform(r, t, points, out, workers, chunk)
+        except batch.BatchException as ex :
+            raise DualQuaternionException("Transform failed: '{0}'".format(ex))
+
+    def __pow(self, t) :
+        # Raises a unit dual quaternion to the real power 't',
+        # based on its screw parameters. For more information, see:
+        # L. Kavan et al., "Dual Quaternions for Rigid Transformation Blending"
+        r, d = self.r, self.d
+        s = math.sqrt(r.i*r.i + r.j*r.j + r.k*r.k)
+        if s < Quaternion.eps :
+            # pure translation, its power is just a scaled translation
+            return DualQuaternion(Quaternion(1.0), d * t)
+
+        theta = 2.0 * math.atan2(s, r.o)
+        lx, ly, lz = r.i / s, r.j / s, r.k / s
+        tr = self.getTranslation()
+        pitch = tr.x*lx + tr.y*ly + tr.z*lz
+        cot = r.o / s
+        # moment of the screw axis: m = 0.5 * (tr x l + (tr - pitch*l) * cot(theta/2))
+        mx = 0.5 * ((tr.y*lz - tr.z*ly) + (tr.x - pitch*lx) * cot)
+        my = 0.5 * ((tr.z*lx - tr.x*lz) + (tr.y - pitch*ly) * cot)
+        mz = 0.5 * ((tr.x*ly - tr.y*lx) + (tr.z - pitch*lz) * cot)
+
+        ht = 0.5 * t * theta
+        hp = 0.5 * t * pitch
+        sn, cs = math.sin(ht), math.cos(ht)
+        return DualQuaternion(
+            Quaternion(cs, sn*lx, sn*ly, sn*lz),
+            Quaternion(-hp*sn,
+                       sn*mx + hp*cs*lx,
+                       sn*my + hp*cs*ly,
+                       sn*mz + hp*cs*lz) )
+
+    def __str__(self) :
+        """
+        "Nicely" formatted output of the dual quaternion (e.g. (1+0i+0j+0k) + eps*(0+1i+0j+0k)).
+
+        The method is called by print().
+        """
+        return "(" + str(self.r) + ") + eps*(" + str(self.d) + ")"
+
+    @staticmethod
+    def fromRotation(rot, translation=None) :
+        """
+        Creates a unit dual quaternion, representing a rotation, followed by a translation.
+
+        Input:
+        rot - rotation (an instance of Rotation or a rotation quaternion)
+        translation - translation (an instance of Point3D, default: no translation)
+
+        Return:
+        a new instance of DualQuaternion
+
+        A DualQuaternionException is raised if any argument is of invalid type.
+        """
+        if isinstance(rot, Rotation) :
+            r = Quaternion(rot.getRotationQuaternion())
+        elif Quaternion.isQuaternion(rot) :
+            try :
+                r = Quaternion(rot.unit())
+            except QuaternionException as qex :
+                raise DualQuaternionException("Invalid rotation: '{0}'".format(qex))
+        else :
+            raise DualQuaternionException("Rotation must be an instance of Rotation or Quaternion")
+
+        if translation is None :
+            return DualQuaternion(r)
+        if not Point3D.isPoint3D(translation) :
+            raise DualQuaternionException("Translation must be an instance of Point3D")
+        t = Quaternion(0.0, translation.x, translation.y, translation.z)
+        return DualQuaternion(r, t * r * 0.5)
+
+    @staticmethod
+    def sclerp(a, b, t) :
+        """
+        Screw linear interpolation (ScLERP) between two unit dual quaternions.
+
+        Input:
+        a - dual quaternion at t=0
+        b - dual quaternion at t=1
+        t - interpolation parameter (a float between 0 and 1)
+
+        Return:
+        a unit dual quaternion a * (a^(-1) * b)^t, always along the shorter path
+
+        A DualQuaternionException is raised if any argument is invalid.
+        """
+        if not (DualQuaternion.isDualQuaternion(a) and DualQuaternion.isDualQuaternion(b)) :
+            raise DualQuaternionException("Input must be an instance of DualQuaternion")
+        if not InstanceCheck.isFloat(t) :
+            raise DualQuaternionException("Interpolation parameter must be a float")
+
+        # a and b are unit, hence a^(-1) = a*
+        diff = a.conj() * b
+        if diff.r.o < 0.0 :
+            # -diff represents the same transform along the shorter path
+            diff = diff * -1.0
+        return (a * diff.__pow(t)).unit()
+
+    @staticmethod
+    def isDualQuaternion(q) :
+        """Is 'q' an instance of DualQuaternion"""
+        return isinstance(q, DualQuaternion)
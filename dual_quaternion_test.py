@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+
+# Copyright 2013, Jernej Kovacic
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+import math
+import sys
+from quaternion import Quaternion
+from rotation import Rotation, RotationException, Point3D
+from dual_quaternion import DualQuaternion, DualQuaternionException
+
+
+"""
+A collection of unit tests for dual quaternions,
+implemented by dual_quaternion.DualQuaternion.
+"""
+
+try :
+    rot = Rotation(rz=1, angle=math.pi/2)
+    dq = DualQuaternion.fromRotation(rot, Point3D(1, 2, 3))
+    print("dq = {0}".format(dq))
+    p = Point3D(1, 1, 1)
+    print("{0} --> {1}".format(p, dq.transform(p)))
+    print("Expected: (0, 3, 4)")
+    print("Translation: {0} (expected: (1, 2, 3))".format(dq.getTranslation()))
+    r = dq.getRotation()
+    print("Rotation: axis {0}, angle {1} deg (expected: (0, 0, 1), 90 deg)".format(
+        r.getAxis(), Rotation.rad2deg(r.getAngle())))
+    print()
+
+    inv = dq.inverse()
+    print("Inverse: {0} --> {1}".format(Point3D(0, 3, 4), inv.transform(Point3D(0, 3, 4))))
+    print("Expected: (1, 1, 1)")
+
+    dq2 = DualQuaternion.fromRotation(Rotation(rx=1, angle=math.pi/2), Point3D(-1, 0, 0))
+    comp = dq2 * dq
+    print("Composition: {0} --> {1}".format(p, comp.transform(p)))
+    print("Expected: {0}".format(dq2.transform(dq.transform(p))))
+    print()
+
+    a = DualQuaternion.fromRotation(Rotation(rz=1, angle=0), Point3D(0, 0, 0))
+    b = DualQuaternion.fromRotation(Rotation(rz=1, angle=math.pi/2), Point3D(0, 0, 2))
+    for t in (0.0, 0.5, 1.0) :
+        s = DualQuaternion.sclerp(a, b, t)
+        print("ScLERP t={0}: rotation angle {1} deg, translation {2}".format(
+            t, Rotation.rad2deg(s.getRotation().getAngle()), s.getTranslation()))
+    print("Expected: 0, 45 and 90 deg, translations (0, 0, 0), (0, 0, 1) and (0, 0, 2)")
+    print()
+
+    pts = dq.transformPoints([[1, 1, 1], [7, 2, -5]])
+    print("Batch transform:\n{0}".format(pts))
+    print("Expected: (0, 3, 4) and {0}".format(dq.transform(Point3D(7, 2, -5))))
+
+    nu = DualQuaternion(Quaternion(2), Quaternion(0, 1, 0, 0))
+    print("Non-unit: {0} --> {1}, batch: {2}".format(
+        Point3D(1, 0, 0), nu.transform(Point3D(1, 0, 0)), nu.transformPoints([[1, 0, 0]])[0]))
+    print("Expected: (2, 0, 0), translation {0} (expected: (1, 0, 0))".format(nu.getTranslation()))
+
+except DualQuaternionException as ex:
+    print("\nDual quaternion exception raised: '{0}'".format(ex), file=sys.stderr)
+except RotationException as ex:
+    print("\nRotation exception raised: '{0}'".format(ex), file=sys.stderr)
+else :
+    print("\nDual quaternion test completed successfully.")
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+
+# Copyright 2013, Jernej Kovacic
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+import os
+import subprocess
+import sys
+
+"""
+A benchmark of import times of the package's modules.
+
+Each module is imported by a fresh interpreter, several times, and the best
+time of the import statement alone (i.e. without the interpreter's start-up)
+is reported.
+Additionally it checks that no heavy dependency (e.g. NumPy) is imported
+by any module as the import of backends' dependencies must be lazy, and
+that the core modules' import times stay within their budgets, given as
+multiples of the import time of the trivial module BASELINE.
+"""
+
+MODULES = ("quaternion", "rotation", "backend", "batch", "dual_quaternion",
+           "transform", "angular_distance", "random_rotation", "orientation_fit",
+           "squad", "validation", "rotation_cli", "keyframe_reduction",
+           "quantized_rotation")
+HEAVY = ("numpy",)
+BASELINE = "exception"
+# Maximum ratios of import times to the baseline's import time
+BUDGET = { "quaternion" : 10.0, "rotation" : 15.0 }
+REPEAT = 7
+
+_SCRIPT = """
+import sys, time
+t0 = time.perf_counter()
+{0}
+t1 = time.perf_counter()
+heavy = [ m for m in {1!r} if m in sys.modules ]
+print(t1 - t0, ",".join(heavy))
+"""
+
+
+def measure(module) :
+    """Returns the best import time of 'module' (in seconds) and loaded heavy modules"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    best, heavy = float("inf"), ""
+    for _ in range(REPEAT) :
+        stmt = "import " + module
+        out = subprocess.check_output(
+                [sys.executable, "-c", _SCRIPT.format(stmt, HEAVY)],
+                cwd=here, universal_newlines=True ).split()
+        best = min(best, float(out[0]))
+        heavy = out[1] if len(out) > 1 else ""
+    return best, heavy
+
+
+failed = False
+base = measure(BASELINE)[0]
+print("import {0:20s} {1:8.3f} ms (baseline)".format(BASELINE, 1000.0 * base))
+for mod in MODULES :
+    t, heavy = measure(mod)
+    print("import {0:20s} {1:8.3f} ms".format(mod, 1000.0 * t))
+    if heavy :
+        print("    imports heavy modules: {0}".format(heavy))
+        failed = True
+    if mod in BUDGET and t > BUDGET[mod] * base :
+        print("    exceeds the budget: {0:.1f} times the baseline (maximum: {1})".format(
+              t / base, BUDGET[mod]))
+        failed = True
+
+if failed :
+    print("\nImport benchmark failed: heavy modules are imported eagerly"
+          " or imports are too slow.", file=sys.stderr)
+    sys.exit(1)
+else :
+    print("\nImport benchmark completed successfully.")
@@ -0,0 +1,192 @@
+# Copyright 2013, Jernej Kovacic
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+A module with online reduction of orientation time series to keyframes.
+
+Samples are dropped if their SLERP reconstruction between the retained
+neighbouring keyframes stays within an angular error bound. The reduction
+is a single pass over the stream, with a bounded lookahead, hence
+arbitrarily long streams can be reduced with constant memory.
+
+Author: Jernej Kovacic
+"""
+
+import math
+import exception
+from quaternion import Quaternion, FrozenQuaternion, QuaternionException
+from rotation import Rotation
+from instance_checker import InstanceCheck
+
+
+class KeyframeReductionException(exception.IException) :
+    """Exception raised at illegal operations of keyframe reduction"""
+    pass
+
+
+class KeyframeReducer() :
+    """
+    A streaming simplifier of orientation time series.
+
+    Keyframes are yielded as soon as they are determined, at most
+    'lookahead' samples after them. The first and the last sample are
+    always retained.
+    """
+
+    # Private internal instance members:
+    # __tol - maximum allowed angular error (radians)
+    # __lookahead - maximum number of buffered samples
+    # __nIn - number of processed samples
+    # __nOut - number of yielded keyframes
+    # __maxErr - maximum angular error of dropped samples
+
+    def __init__(self, tolerance, lookahead=256) :
+        """
+        A "constructor" that initializes the reducer.
+
+        Input:
+        tolerance - maximum angular error (in radians) between a dropped
+                    sample and its reconstruction
+        lookahead - maximum number of samples, buffered after the last
+                    keyframe (default: 256)
+
+        A KeyframeReductionException is raised if any argument is invalid.
+        """
+        if not InstanceCheck.isFloat(tolerance) or tolerance < 0.0 :
+            raise KeyframeReductionException("Tolerance must be a non-negative float")
+        if not isinstance(lookahead, int) or lookahead < 1 :
+            raise KeyframeReductionException("Lookahead must be a positive integer")
+        self.__tol = float(tolerance)
+        self.__lookahead = lookahead
+        self.__nIn = 0
+        self.__nOut = 0
+        self.__maxErr = 0.0
+
+    def getInputCount(self) :
+        """Returns number of processed samples"""
+        return self.__nIn
+
+    def getOutputCount(self) :
+        """Returns number of yielded keyframes"""
+        return self.__nOut
+
+    def getMaxError(self) :
+        """Returns the maximum angular error (in radians) of all dropped samples"""
+        return self.__maxErr
+
+    def getCompressionRatio(self) :
+        """Returns the ratio of numbers of processed samples and yielded keyframes"""
+        if self.__nOut == 0 :
+            return 1.0
+        return self.__nIn / float(self.__nOut)
+
+    def __sample(self, idx, s, last) :
+        # Converts a stream's element into a pair (time, unit FrozenQuaternion).
+        # An element is either a pair (time, q) or just 'q' whose time is its index.
+        if Quaternion.isQuaternion(s) or isinstance(s, Rotation) :
+            t, q = idx, s
+        else :
+            try :
+                t, q = s
+            except (TypeError, ValueError) :
+                raise KeyframeReductionException("Samples must be pairs (time, quaternion)")
+        if not InstanceCheck.isFloat(t) :
+            raise KeyframeReductionException("Time must be a float value")
+        if last is not None and t <= last :
+            raise KeyframeReductionException("Times of samples must be strictly increasing")
+        if isinstance(q, Rotation) :
+            q = q.getRotationQuaternion()
+        if not Quaternion.isQuaternion(q) :
+            raise KeyframeReductionException("Orientation must be a quaternion or a Rotation")
+        try :
+            return t, FrozenQuaternion(q.unit())
+        except QuaternionException as qex :
+            raise KeyframeReductionException("Invalid orientation: '{0}'".format(qex))
+
+    @staticmethod
+    def __segmentError(a, b, buf, tol) :
+        # Maximum angular error of buffered samples, reconstructed
+        # by SLERP between keyframes 'a' and 'b'. Stops as soon as
+        # the error exceeds 'tol'.
+        ta, qa = a
+        tb, qb = b
+        if qa.o*qb.o + qa.i*qb.i + qa.j*qb.j + qa.k*qb.k < 0.0 :
+            # interpolate along the shorter path
+            qb = -qb
+        span = float(tb - ta)
+        err = 0.0
+        for t, q in buf :
+            r = Quaternion.slerp(qa, qb, (t - ta) / span)
+            dot = abs(r.o*q.o + r.i*q.i + r.j*q.j + r.k*q.k)
+            err = max(err, 2.0 * math.acos(min(dot, 1.0)))
+            if err > tol :
+                break
+        return err
+
+    def reduce(self, samples) :
+        """
+        A generator that yields keyframes of the stream 'samples'.
+
+        Input:
+        samples - an iterable of pairs (time, q) with strictly increasing
+                  times, 'q' is a rotation quaternion or an instance of Rotation.
+                  Alternatively elements may be just orientations, in this
+                  case their indices are used as times.
+
+        Yields:
+        retained keyframes as pairs (time, FrozenQuaternion)
+
+        Counters and the maximum error are updated as the stream is processed.
+
+        A KeyframeReductionException is raised if any sample is invalid.
+        """
+        anchor = None
+        # samples after the anchor, all within tolerance of the segment
+        # between the anchor and the last buffered sample
+        buf = []
+        segErr = 0.0
+        last = None
+
+        for idx, s in enumerate(samples) :
+            cur = self.__sample(idx, s, last)
+            last = cur[0]
+            self.__nIn += 1
+
+            if anchor is None :
+                anchor = cur
+                self.__nOut += 1
+                yield cur
+                continue
+
+            if buf and len(buf) < self.__lookahead :
+                err = KeyframeReducer.__segmentError(anchor, cur, buf, self.__tol)
+                if err <= self.__tol :
+                    buf.append(cur)
+                    segErr = err
+                    continue
+
+            if buf :
+                # the last buffered sample becomes a keyframe
+                anchor = buf[-1]
+                self.__maxErr = max(self.__maxErr, segErr)
+                self.__nOut += 1
+                yield anchor
+                # samples between the previous and the new anchor are dropped
+            buf = [ cur ]
+            segErr = 0.0
+
+        if buf :
+            self.__maxErr = max(self.__maxErr, segErr)
+            self.__nOut += 1
+            yield buf[-1]
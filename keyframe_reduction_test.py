@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+# Copyright 2013, Jernej Kovacic
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+import bisect
+import math
+import sys
+from quaternion import Quaternion
+from rotation import Rotation
+import angular_distance
+from keyframe_reduction import KeyframeReducer, KeyframeReductionException
+
+
+"""
+A collection of unit tests for keyframe reduction,
+implemented by keyframe_reduction.KeyframeReducer.
+"""
+
+
+def stream(n) :
+    """An oversampled orientation stream: a rotation with a slowly varying axis"""
+    for idx in range(n) :
+        t = 0.01 * idx
+        yield t, Rotation(math.sin(0.3*t), math.cos(0.2*t), 1.0, 0.5*t + 0.2*math.sin(t))
+
+
+try :
+    tol = Rotation.deg2rad(0.5)
+    red = KeyframeReducer(tol, lookahead=128)
+    keys = list(red.reduce(stream(20000)))
+    print("Samples: {0}, keyframes: {1}, compression ratio: {2}".format(
+        red.getInputCount(), red.getOutputCount(), red.getCompressionRatio()))
+    print("Max. error: {0} deg (tolerance: 0.5 deg)".format(Rotation.rad2deg(red.getMaxError())))
+
+    # independent check of the reconstruction error of all samples
+    times = [ k[0] for k in keys ]
+    worst = 0.0
+    for t, rot in stream(20000) :
+        i = min(bisect.bisect_right(times, t) - 1, len(keys) - 2)
+        (ta, qa), (tb, qb) = keys[i], keys[i + 1]
+        if qa.o*qb.o + qa.i*qb.i + qa.j*qb.j + qa.k*qb.k < 0.0 :
+            qb = -qb
+        r = Quaternion.slerp(qa, qb, (t - ta) / (tb - ta))
+        worst = max(worst, angular_distance.distance(r, rot.getRotationQuaternion()))
+    print("Max. reconstruction error, checked independently: {0} deg".format(Rotation.rad2deg(worst)))
+
+    red = KeyframeReducer(0.0)
+    keys = list(red.reduce([ Quaternion(1), Quaternion(1), Quaternion(1) ]))
+    print("Zero tolerance: {0} keyframes (expected: 2), times {1}".format(len(keys), [ k[0] for k in keys ]))
+
+except KeyframeReductionException as ex:
+    print("\nKeyframe reduction exception raised: '{0}'".format(ex), file=sys.stderr)
+else :
+    print("\nKeyframe reduction test completed successfully.")
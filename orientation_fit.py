@@ -0,0 +1,236 @@
+# Copyright 2013, Jernej Kovacic
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+A module with estimation of a rotation (and a translation) from point
+correspondences, i.e. the absolute orientation problem, solved by
+Horn's quaternion based method, see:
+B. K. P. Horn, "Closed-form solution of absolute orientation using unit
+quaternions", Journal of the Optical Society of America A, 1987
+
+Correspondences are accumulated in chunks, so the memory does not depend
+on their number, and accumulators of several workers can be merged.
+NumPy is imported when an accumulator is created.
+
+Author: Jernej Kovacic
+"""
+
+import math
+import exception
+import backend
+from quaternion import Quaternion
+from rotation import Rotation, RotationException, Point3D
+
+
+class OrientationFitException(exception.IException) :
+    """Exception raised at illegal operations of orientation fitting"""
+    pass
+
+
+class OrientationAccumulator() :
+    """
+    Accumulates weighted point correspondences (src[n] -> dst[n]) and
+    estimates the rotation R and the translation t that minimize
+        sum( w[n] * ||R*src[n] + t - dst[n]||^2 )
+
+    Only weighted means, the 3x3 cross-covariance and sums of squared
+    deviations are kept. Chunks and accumulators are combined by
+    the pairwise update of means and co-moments, which is numerically
+    stable even for coordinates, far away from the origin.
+    """
+
+    # Private internal instance members:
+    # __np - the numpy module
+    # __n - number of accumulated correspondences
+    # __w - sum of weights
+    # __ma, __mb - weighted means of source and destination points (arrays (3,))
+    # __c - cross-covariance sum( w * (a-ma) * (b-mb)^T ) (array (3,3))
+    # __saa, __sbb - sums of weighted squared deviations from means
+
+    def __init__(self) :
+        """
+        A "constructor" that initializes an empty accumulator.
+
+        An OrientationFitException is raised if NumPy is not installed.
+        """
+        try :
+            np = backend.numpy()
+        except backend.BackendException as bex :
+            raise OrientationFitException("Orientation fitting requires NumPy: '{0}'".format(bex))
+        self.__np = np
+        self.__n = 0
+        self.__w = 0.0
+        self.__ma = np.zeros(3)
+        self.__mb = np.zeros(3)
+        self.__c = np.zeros((3, 3))
+        self.__saa = 0.0
+        self.__sbb = 0.0
+
+    def getCount(self) :
+        """Returns number of accumulated correspondences"""
+        return self.__n
+
+    def getWeight(self) :
+        """Returns the sum of weights of accumulated correspondences"""
+        return self.__w
+
+    def __combine(self, n, w, ma, mb, c, saa, sbb) :
+        # Combines statistics of another set of correspondences into this one
+        if w <= 0.0 :
+            self.__n += n
+            return
+        w1 = self.__w
+        wt = w1 + w
+        da = ma - self.__ma
+        db = mb - self.__mb
+        f = w1 * w / wt
+        self.__ma = self.__ma + da * (w / wt)
+        self.__mb = self.__mb + db * (w / wt)
+        self.__c = self.__c + c + self.__np.outer(da, db) * f
+        self.__saa += saa + da.dot(da) * f
+        self.__sbb += sbb + db.dot(db) * f
+        self.__w = wt
+        self.__n += n
+
+    def add(self, src, dst, weights=None) :
+        """
+        Accumulates a chunk of correspondences.
+
+        Input:
+        src - an array of shape (N,3) with source points
+        dst - an array of shape (N,3) with corresponding destination points
+        weights - an optional array of shape (N,) with non-negative weights
+                  (default: all weights equal 1)
+
+        Return:
+        a reference to itself
+
+        An OrientationFitException is raised if any argument is invalid.
+        """
+        np = self.__np
+        a = np.asarray(src, dtype=float)
+        b = np.asarray(dst, dtype=float)
+        if a.ndim != 2 or a.shape[1] != 3 or a.shape != b.shape :
+            raise OrientationFitException("'src' and 'dst' must be arrays of the same shape (N,3)")
+        n = a.shape[0]
+        if n == 0 :
+            return self
+
+        if weights is None :
+            w = None
+            wsum = float(n)
+            ma = a.mean(axis=0)
+            mb = b.mean(axis=0)
+        else :
+            w = np.asarray(weights, dtype=float).ravel()
+            if w.shape[0] != n :
+                raise OrientationFitException("Number of weights must equal number of points")
+            if (w < 0.0).any() :
+                raise OrientationFitException("Weights must not be negative")
+            wsum = float(w.sum())
+            if wsum <= 0.0 :
+                self.__n += n
+                return self
+            ma = w.dot(a) / wsum
+            mb = w.dot(b) / wsum
+
+        ac = a - ma
+        bc = b - mb
+        wac = ac * w[:, None] if w is not None else ac
+        wbc = bc * w[:, None] if w is not None else bc
+        c = wac.T.dot(bc)
+        saa = float(np.einsum("ij,ij->", wac, ac))
+        sbb = float(np.einsum("ij,ij->", wbc, bc))
+
+        self.__combine(n, wsum, ma, mb, c, saa, sbb)
+        return self
+
+    def merge(self, other) :
+        """
+        Merges another accumulator (e.g. of another worker) into this one.
+
+        Return:
+        a reference to itself
+
+        An OrientationFitException is raised if 'other' is not an OrientationAccumulator.
+        """
+        if not isinstance(other, OrientationAccumulator) :
+            raise OrientationFitException("Input must be an instance of OrientationAccumulator")
+        self.__combine(other.__n, other.__w, other.__ma, other.__mb,
+                       other.__c, other.__saa, other.__sbb)
+        return self
+
+    def solve(self, translation=True) :
+        """
+        Estimates the rotation (and the translation) from all
+        accumulated correspondences.
+
+        Input:
+        translation - if True, the translation is estimated as well, otherwise
+                      it is fixed to 0, i.e. the rotation is about the origin
+                      (default: True)
+
+        Return:
+        a tuple (rot, t, rms), where 'rot' is an instance of Rotation, 't'
+        is the translation (an instance of Point3D) and 'rms' is the weighted
+        root mean square residual, i.e. sqrt(sum(w*||R*src+t-dst||^2) / sum(w))
+
+        An OrientationFitException is raised if no correspondences (with
+        positive weights) have been accumulated.
+        """
+        np = self.__np
+        wt = self.__w
+        if wt <= 0.0 :
+            raise OrientationFitException("No correspondences accumulated")
+
+        ma, mb = self.__ma, self.__mb
+        s = self.__c
+        saa, sbb = self.__saa, self.__sbb
+        if not translation :
+            # moments about the origin instead of about the means
+            s = s + np.outer(ma, mb) * wt
+            saa += ma.dot(ma) * wt
+            sbb += mb.dot(mb) * wt
+
+        # Horn's symmetric 4x4 matrix; its eigenvector, belonging to the
+        # largest eigenvalue, is the optimal rotation quaternion (o, i, j, k)
+        (sxx, sxy, sxz), (syx, syy, syz), (szx, szy, szz) = s
+        nm = np.array([
+            [ sxx + syy + szz, syz - szy,        szx - sxz,        sxy - syx       ],
+            [ syz - szy,       sxx - syy - szz,  sxy + syx,        szx + sxz       ],
+            [ szx - sxz,       sxy + syx,       -sxx + syy - szz,  syz + szy       ],
+            [ sxy - syx,       szx + sxz,        syz + szy,       -sxx - syy + szz ] ])
+        vals, vecs = np.linalg.eigh(nm)
+        lmax = vals[-1]
+        o, i, j, k = vecs[:, -1]
+        if o < 0.0 :
+            # 'q' and '-q' represent the same rotation, prefer angles up to pi
+            o, i, j, k = -o, -i, -j, -k
+
+        try :
+            q = Quaternion(float(o), float(i), float(j), float(k))
+            rot = Rotation.fromQuaternion(q)
+        except RotationException as rex :
+            raise OrientationFitException("Could not estimate the rotation: '{0}'".format(rex))
+
+        if translation :
+            m = np.array(q.rotationMatrix())
+            t = mb - m.dot(ma)
+            tp = Point3D(float(t[0]), float(t[1]), float(t[2]))
+        else :
+            tp = Point3D()
+
+        # the minimum of the sum of squared residuals equals saa + sbb - 2*lmax
+        res = max(saa + sbb - 2.0 * lmax, 0.0)
+        return rot, tp, math.sqrt(res / wt)
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+
+# Copyright 2013, Jernej Kovacic
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+import sys
+import numpy as np
+from rotation import Rotation
+import batch
+from orientation_fit import OrientationAccumulator, OrientationFitException
+
+
+"""
+A collection of unit tests for estimation of rotations from point
+correspondences, implemented by orientation_fit.OrientationAccumulator.
+"""
+
+try :
+    rng = np.random.default_rng(3)
+    rot = Rotation(2, -3, 1, Rotation.deg2rad(30))
+    t = (1000.0, -2000.0, 500.0)
+    src = rng.uniform(-10.0, 10.0, (100000, 3)) + 5000.0
+    dst = batch.transform(rot, t, src)
+
+    # two "workers", each accumulating chunks of its half
+    acc1 = OrientationAccumulator()
+    acc2 = OrientationAccumulator()
+    for lo in range(0, 50000, 8192) :
+        hi = min(lo + 8192, 50000)
+        acc1.add(src[lo:hi], dst[lo:hi])
+        acc2.add(src[50000+lo:50000+hi], dst[50000+lo:50000+hi])
+    acc1.merge(acc2)
+    r, tr, rms = acc1.solve()
+    print("Correspondences: {0}".format(acc1.getCount()))
+    print("Axis: {0}, angle: {1} deg".format(r.getAxis(), Rotation.rad2deg(r.getAngle())))
+    print("Expected: (0.53452, -0.80178, 0.26726), 30 deg")
+    print("Translation: {0} (expected: {1})".format(tr, t))
+    print("RMS residual: {0} (expected: 0)".format(rms))
+    print()
+
+    noisy = dst + rng.normal(0.0, 0.01, dst.shape)
+    w = np.ones(src.shape[0])
+    # outliers with zero weights must not affect the estimate
+    noisy[:100] += 50.0
+    w[:100] = 0.0
+    r, tr, rms = OrientationAccumulator().add(src, noisy, w).solve()
+    print("Noisy: angle {0} deg, RMS residual {1} (expected: about 0.017)".format(
+        Rotation.rad2deg(r.getAngle()), rms))
+
+    r, tr, rms = OrientationAccumulator().add(src, batch.rotate(rot, src)).solve(translation=False)
+    print("Rotation only: angle {0} deg, translation {1}, RMS residual {2}".format(
+        Rotation.rad2deg(r.getAngle()), tr, rms))
+
+except OrientationFitException as ex:
+    print("\nOrientation fit exception raised: '{0}'".format(ex), file=sys.stderr)
+else :
+    print("\nOrientation fit test completed successfully.")
@@ -0,0 +1,207 @@
+# Copyright 2013, Jernej Kovacic
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+A module with rotations about a fixed axis by angles on a fixed grid,
+e.g. angles of stepper motors or rotary encoders.
+
+Rotation quaternions and matrices of all angles on the grid are tabulated,
+so rotations are selected by integer step indices and composed by addition
+of indices, without any trigonometric function at run time.
+
+Author: Jernej Kovacic
+"""
+
+import math
+import numbers
+import sys
+import exception
+from quaternion import FrozenQuaternion
+from rotation import Point3D, PointException
+from instance_checker import InstanceCheck
+
+
+class QuantizedRotationException(exception.IException) :
+    """Exception raised at illegal operations with quantized rotations"""
+    pass
+
+
+# Tables with more steps are built lazily (by default)
+LAZY_THRESHOLD = 4096
+
+
+class QuantizedRotationTable() :
+    """
+    A table of rotations about an axis by angles idx*resolution, where
+    'idx' is an integer step index and 2*pi is a multiple of 'resolution'.
+
+    Indices are taken modulo the number of steps per revolution, hence
+    the rotation idx1 followed by the rotation idx2 equals the rotation
+    idx1+idx2 and the inverse rotation of idx equals -idx.
+
+    Small tables are built when created. Entries of large tables are
+    calculated and stored when they are accessed for the first time.
+    """
+
+    # Private internal instance members:
+    # __axis - unit vector of the axis of rotation (a tuple of 3 floats)
+    # __steps - number of steps per revolution
+    # __res - angle of one step (in radians)
+    # __table - a dictionary of built entries (FrozenQuaternion) by step indices
+
+    def __init__(self, rx=0.0, ry=0.0, rz=1.0, resolution=math.pi/180.0, lazy=None) :
+        """
+        A "constructor" that initializes the table.
+
+        Input:
+        rx, ry, rz - components of the axis of rotation (default: the z-axis),
+                     'rx' may also be an instance of Point3D; in this case
+                     'ry' and 'rz' are ignored
+        resolution - angle of one step in radians, 2*pi must be its multiple
+                     (default: 1 degree)
+        lazy - if True, entries are built on first access, if False, all
+               entries are built immediately, if None, the table is built
+               lazily if it has more than LAZY_THRESHOLD steps (default: None)
+
+        A QuantizedRotationException is raised if any argument is invalid.
+        """
+        try :
+            r = Point3D(rx, ry, rz)
+        except PointException :
+            raise QuantizedRotationException("Invalid axis of rotation")
+        n = math.sqrt(r.sqSum())
+        if n < 1e-12 :
+            raise QuantizedRotationException("Axis of rotation must not be a zero vector")
+        if not InstanceCheck.isFloat(resolution) or resolution <= 0.0 :
+            raise QuantizedRotationException("Resolution must be a positive float")
+        steps = int(round(2.0 * math.pi / resolution))
+        if steps < 1 or abs(steps * resolution - 2.0 * math.pi) > 1e-9 :
+            raise QuantizedRotationException("2*pi must be a multiple of the resolution")
+
+        self.__axis = (r.x / n, r.y / n, r.z / n)
+        self.__steps = steps
+        self.__res = 2.0 * math.pi / steps
+        self.__table = {}
+        if lazy is None :
+            lazy = steps > LAZY_THRESHOLD
+        if not lazy :
+            for idx in range(steps) :
+                self.__entry(idx)
+
+    def __entry(self, idx) :
+        # Returns the entry of a normalized index, builds it if necessary
+        q = self.__table.get(idx)
+        if q is None :
+            # The only trigonometric functions are evaluated here,
+            # once per entry. The matrix is cached by the quaternion.
+            half = 0.5 * idx * self.__res
+            s = math.sin(half)
+            ax, ay, az = self.__axis
+            q = FrozenQuaternion(math.cos(half), s * ax, s * ay, s * az)
+            q.rotationMatrix()
+            self.__table[idx] = q
+        return q
+
+    def __normalize(self, idx) :
+        # Converts any integer index into the range [0, steps)
+        if not isinstance(idx, numbers.Integral) :
+            raise QuantizedRotationException("Step index must be an integer")
+        return idx % self.__steps
+
+    def getSteps(self) :
+        """Returns number of steps per revolution"""
+        return self.__steps
+
+    def getResolution(self) :
+        """Returns the angle of one step in radians"""
+        return self.__res
+
+    def getAxis(self) :
+        """Returns the unit vector of the axis of rotation (an instance of Point3D)"""
+        return Point3D(*self.__axis)
+
+    def getBuiltCount(self) :
+        """Returns number of already built entries"""
+        return len(self.__table)
+
+    def index(self, angle) :
+        """
+        Returns the index of the step, nearest to 'angle' (in radians).
+
+        A QuantizedRotationException is raised if 'angle' is not a float.
+        """
+        if not InstanceCheck.isFloat(angle) :
+            raise QuantizedRotationException("Angle must be a float value")
+        return int(round(angle / self.__res)) % self.__steps
+
+    def getAngle(self, idx) :
+        """Returns the angle (in radians, in [0, 2*pi)) of the step 'idx'"""
+        return self.__normalize(idx) * self.__res
+
+    def compose(self, idx1, idx2) :
+        """Returns the index of the rotation 'idx1' followed by the rotation 'idx2'"""
+        return (self.__normalize(idx1) + self.__normalize(idx2)) % self.__steps
+
+    def inverse(self, idx) :
+        """Returns the index of the inverse rotation of 'idx'"""
+        return (-self.__normalize(idx)) % self.__steps
+
+    def getQuaternion(self, idx) :
+        """
+        Returns the rotation quaternion (an instance of FrozenQuaternion)
+        of the step 'idx'. It can be passed to batch.rotate.
+
+        A QuantizedRotationException is raised if 'idx' is not an integer.
+        """
+        return self.__entry(self.__normalize(idx))
+
+    def getMatrix(self, idx) :
+        """
+        Returns the rotation matrix (a tuple of rows, each a tuple
+        of 3 floats) of the step 'idx'.
+
+        A QuantizedRotationException is raised if 'idx' is not an integer.
+        """
+        return self.__entry(self.__normalize(idx)).rotationMatrix()
+
+    def rotate(self, idx, p) :
+        """
+        Rotates the point 'p' (an instance of Point3D) by the step 'idx'.
+
+        Return:
+        coordinates of the rotated point (an instance of Point3D)
+
+        A QuantizedRotationException is raised if any argument is invalid.
+        """
+        if not Point3D.isPoint3D(p) :
+            raise QuantizedRotationException("Input must be an instance of Point3D")
+        m0, m1, m2 = self.getMatrix(idx)
+        x, y, z = p.x, p.y, p.z
+        return Point3D(
+            m0[0]*x + m0[1]*y + m0[2]*z,
+            m1[0]*x + m1[1]*y + m1[2]*z,
+            m2[0]*x + m2[1]*y + m2[2]*z )
+
+    def getMemoryUsage(self) :
+        """
+        Returns an estimate of the table's memory (in bytes), i.e. the dictionary
+        of entries and all built quaternions with their rotation matrices.
+        Memory of a lazily built table grows with the number of accessed steps.
+        """
+        size = sys.getsizeof(self.__table)
+        if not self.__table :
+            return size
+        # all entries have the same structure
+        entry = next(iter(self.__table.values())).getMemoryUsage()
+        return size + len(self.__table) * entry
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+
+# Copyright 2013, Jernej Kovacic
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+import math
+import sys
+from rotation import Rotation, Point3D
+from quantized_rotation import QuantizedRotationTable, QuantizedRotationException
+
+
+"""
+A collection of unit tests for tables of quantized rotations,
+implemented by quantized_rotation.QuantizedRotationTable.
+"""
+
+try :
+    table = QuantizedRotationTable(1, 2, 3, Rotation.deg2rad(1.0))
+    print("Steps: {0}, built: {1}, memory: {2} bytes".format(
+        table.getSteps(), table.getBuiltCount(), table.getMemoryUsage()))
+
+    rot = Rotation(1, 2, 3, Rotation.deg2rad(30))
+    p = Point3D(7, 2, -5)
+    print("Step 30: {0}".format(table.rotate(30, p)))
+    print("Expected: {0}".format(rot.rotate(p)))
+    print("Quaternion: {0} (expected: {1})".format(
+        table.getQuaternion(30), rot.getRotationQuaternion()))
+
+    idx = table.compose(200, 190)
+    print("200 + 190 = {0} (expected: 30), inverse of 30: {1} (expected: 330)".format(
+        idx, table.inverse(30)))
+    q = table.getQuaternion(200) * table.getQuaternion(190)
+    print("q(200)*q(190) = {0}, equals -q(30)".format(q))
+    print("Index of 29.7 deg: {0}, -1 deg: {1}, angle of step -90: {2} deg".format(
+        table.index(Rotation.deg2rad(29.7)), table.index(Rotation.deg2rad(-1.0)),
+        Rotation.rad2deg(table.getAngle(-90))))
+    print()
+
+    # an encoder with 2^20 steps per revolution
+    lazy = QuantizedRotationTable(0, 0, 1, 2.0 * math.pi / (1 << 20))
+    print("Steps: {0}, built: {1}, memory: {2} bytes".format(
+        lazy.getSteps(), lazy.getBuiltCount(), lazy.getMemoryUsage()))
+    print("Step 2^18: {0} (expected: ( -2, 7, -5 ))".format(lazy.rotate(1 << 18, p)))
+    print("Built: {0}, memory: {1} bytes".format(lazy.getBuiltCount(), lazy.getMemoryUsage()))
+    print()
+
+    try :
+        QuantizedRotationTable(0, 0, 1, Rotation.deg2rad(7.0))
+        print("ERROR: a resolution of 7 deg accepted")
+    except QuantizedRotationException as ex :
+        print("A resolution of 7 deg rejected: {0}".format(ex))
+
+except QuantizedRotationException as ex:
+    print("\nQuantized rotation exception raised: '{0}'".format(ex), file=sys.stderr)
+else :
+    print("\nQuantized rotation test completed successfully.")
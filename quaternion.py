@@ -19,6 +19,7 @@ Author: Jernej Kovacic
 """
 
 import math
+import sys
 import exception
 from instance_checker import InstanceCheck
 
@@ -27,6 +28,58 @@ class QuaternionException(exception.IException) :
     """Exception raised at illegal quaternion operations"""
     pass
 
+
+class DriftMonitor() :
+    """
+    Collects deviations of squared norms from 1, observed by renormalizations
+    (see Quaternion.renormalize and batch.renormalize).
+    """
+
+    # Private internal instance members:
+    # __count - number of renormalized quaternions
+    # __maxDev - the worst observed deviation |norm^2 - 1|
+    # __fallbacks - number of exact normalizations
+
+    def __init__(self) :
+        """A "constructor" that initializes a monitor without observations"""
+        self.reset()
+
+    def reset(self) :
+        """Discards all observations"""
+        self.__count = 0
+        self.__maxDev = 0.0
+        self.__fallbacks = 0
+
+    def update(self, count, maxDeviation, fallbacks) :
+        """
+        Records observations of a batch.
+
+        Input:
+        count - number of renormalized quaternions
+        maxDeviation - the worst deviation |norm^2 - 1| of the batch,
+                       NaN is recorded as an infinite deviation
+        fallbacks - number of quaternions, normalized exactly
+        """
+        self.__count += count
+        self.__fallbacks += fallbacks
+        if maxDeviation != maxDeviation :
+            # a non-finite quaternion
+            maxDeviation = float("inf")
+        if maxDeviation > self.__maxDev :
+            self.__maxDev = maxDeviation
+
+    def getCount(self) :
+        """Returns number of renormalized quaternions"""
+        return self.__count
+
+    def getMaxDeviation(self) :
+        """Returns the worst observed deviation of a squared norm from 1"""
+        return self.__maxDev
+
+    def getFallbackCount(self) :
+        """Returns number of quaternions, too far from unit norm for the fast correction"""
+        return self.__fallbacks
+
         
 class Quaternion() :
     """
@@ -42,6 +95,9 @@ class Quaternion() :
     """Tolerance for determination whether a number is "close enough" to zero"""
     eps = 1e-12
 
+    """Maximum deviation |norm^2 - 1| of renormalization's first order correction"""
+    renormTolerance = 1e-4
+
     def __init__(self, o=0.0, i=0.0, j=0.0, k=0.0) :
         """
         A "constructor" that creates an instance of a quaternion and assigns values to its components.
@@ -105,7 +161,7 @@ class Quaternion() :
             
             
     def getScalar(self) :
-	"""Returns the scalar component of the quaternion"""
+        """Returns the scalar component of the quaternion"""
         return self.o
     
     def getI(self) :
@@ -486,6 +542,150 @@ class Quaternion() :
             self.k / n )
 
 
+    def __renormFactor(self, tolerance, monitor) :
+        # Factor that renormalizes the quaternion, see renormalize()
+        nsq = self.__sqsum()
+        dev = nsq - 1.0
+        if tolerance is None :
+            tolerance = Quaternion.renormTolerance
+        if abs(dev) <= tolerance :
+            # 1/sqrt(nsq), approximated by a Newton step from 1
+            f = 1.0 - 0.5 * dev
+            fallback = 0
+        else :
+            if nsq < Quaternion.eps :
+                raise QuaternionException("Cannot normalize a zero-quaternion")
+            f = 1.0 / math.sqrt(nsq)
+            fallback = 1
+        if monitor is not None :
+            monitor.update(1, abs(dev), fallback)
+        return f
+
+
+    def renormalize(self, tolerance=None, monitor=None) :
+        """
+        Renormalizes a quaternion that is nearly a unit one (in place).
+        
+        If the squared norm deviates from 1 by at most 'tolerance', the
+        quaternion is multiplied by a first order (Newton step) approximation
+        of 1/norm, i.e. (3 - norm^2)/2, without a square root. The remaining
+        deviation of the squared norm is about 3/4 of the deviation squared.
+        Otherwise the quaternion is normalized exactly, as by unit().
+        
+        Input:
+        tolerance - maximum deviation |norm^2 - 1| of the approximation
+                    (default: Quaternion.renormTolerance)
+        monitor - an optional instance of DriftMonitor that records the deviation
+        
+        Return:
+        a reference to itself
+        
+        A QuaternionException is raised if quaternion's norm equals 0.
+        """
+        
+        f = self.__renormFactor(tolerance, monitor)
+        self.o, self.i, self.j, self.k = \
+            self.o * f, self.i * f, self.j * f, self.k * f
+        return self
+
+
+    def renormalized(self, tolerance=None, monitor=None) :
+        """
+        A renormalized copy of a nearly unit quaternion, see renormalize().
+        
+        A QuaternionException is raised if quaternion's norm equals 0.
+        """
+        
+        f = self.__renormFactor(tolerance, monitor)
+        return Quaternion(
+            self.o * f,
+            self.i * f,
+            self.j * f,
+            self.k * f )
+
+
+    def exp(self) :
+        """
+        Exponential function of a quaternion.
+        
+        Return: e^self (a new instance of Quaternion)
+        """
+        
+        # For q = a + v, where v = b*i + c*j + d*k, the exponential is:
+        #
+        # e^q = e^a * ( cos(||v||) + v/||v|| * sin(||v||) )
+        #
+        # sin(||v||)/||v|| approaches 1 when ||v|| approaches 0.
+
+        vn = math.sqrt(self.i*self.i + self.j*self.j + self.k*self.k)
+        ea = math.exp(self.o)
+        f = ea * math.sin(vn) / vn if vn > Quaternion.eps else ea
+        return Quaternion(
+            ea * math.cos(vn),
+            self.i * f,
+            self.j * f,
+            self.k * f )
+
+
+    def log(self) :
+        """
+        Natural logarithm of a quaternion (the principal value).
+        
+        Return: ln(self) (a new instance of Quaternion)
+        
+        A QuaternionException is raised if quaternion's norm equals 0.
+        """
+        
+        # For q = a + v, where v = b*i + c*j + d*k, the logarithm is:
+        #
+        # ln(q) = ln(||q||) + v/||v|| * acos(a/||q||)
+        #
+        # If ||v|| equals 0, the vector part is set to 0.
+
+        n = self.norm()
+        if n < Quaternion.eps :
+            raise QuaternionException("Logarithm of a zero-quaternion does not exist")
+        vn = math.sqrt(self.i*self.i + self.j*self.j + self.k*self.k)
+        if vn > Quaternion.eps :
+            f = math.atan2(vn, self.o) / vn
+        else :
+            f = 0.0
+        return Quaternion(
+            math.log(n),
+            self.i * f,
+            self.j * f,
+            self.k * f )
+
+
+    def rotationMatrix(self) :
+        """
+        Rotation matrix of the quaternion, i.e. a 3x3 matrix 'm', satisfying
+        m*p == q*p*q^(-1) for any vector 'p'. The quaternion does not need
+        to be a unit one.
+        
+        Return:
+        a tuple of matrix's rows (each a tuple of 3 floats)
+        
+        A QuaternionException is raised if quaternion's norm equals 0.
+        """
+        
+        # For the derivation of the matrix, see:
+        # http://en.wikipedia.org/wiki/Quaternions_and_spatial_rotation
+        #
+        # If the quaternion is not a unit one, all quadratic terms
+        # are divided by its squared norm.
+
+        nsq = self.__sqsum()
+        if nsq < Quaternion.eps :
+            raise QuaternionException("Rotation matrix of a zero-quaternion does not exist")
+        s = 2.0 / nsq
+        o, i, j, k = self.o, self.i, self.j, self.k
+        return (
+            ( 1.0 - s*(j*j + k*k), s*(i*j - k*o),       s*(i*k + j*o) ),
+            ( s*(i*j + k*o),       1.0 - s*(i*i + k*k), s*(j*k - i*o) ),
+            ( s*(i*k - j*o),       s*(j*k + i*o),       1.0 - s*(i*i + j*j) ) )
+
+
     def __str__(self) :
         """
         "Nicely" formatted output of the quaternion (e.g. 4-5i+7j-3k).
@@ -512,7 +712,207 @@ class Quaternion() :
         
         return outstr
 
+    @staticmethod
+    def slerp(p, q, t) :
+        """
+        Spherical linear interpolation (SLERP) between unit quaternions.
+        
+        Input:
+        p - unit quaternion at t=0
+        q - unit quaternion at t=1
+        t - interpolation parameter (a float, typically between 0 and 1)
+        
+        Return:
+        a unit quaternion between 'p' and 'q' (a new instance of Quaternion)
+        
+        Note that 'q' and '-q' represent the same rotation. If the shorter
+        path between rotations is desired, 'q' should be negated when the
+        dot product of 'p' and 'q' is negative.
+        
+        A QuaternionException is raised if 'p' or 'q' is not a quaternion
+        or 't' is not a float.
+        """
+        
+        # slerp(p, q, t) = ( sin((1-t)*w) * p + sin(t*w) * q ) / sin(w)
+        #
+        # where w is the angle between 'p' and 'q' (cos(w) = p.q).
+        # For very close quaternions, normalized linear interpolation is
+        # used instead. Nearly opposite quaternions do not determine a great
+        # circle, the path then passes a quaternion, orthogonal to 'p'.
+
+        if not (Quaternion.isQuaternion(p) and Quaternion.isQuaternion(q) and
+                InstanceCheck.isFloat(t)) :
+            raise QuaternionException("Invalid input arguments")
+        
+        dot = p.o*q.o + p.i*q.i + p.j*q.j + p.k*q.k
+        dot = max(-1.0, min(1.0, dot))
+        w = math.acos(dot)
+        sw = math.sin(w)
+        if sw < 1e-6 and dot < 0.0 :
+            r = Quaternion(-p.i, p.o, -p.k, p.j)
+            if t <= 0.5 :
+                return Quaternion.slerp(p, r, 2.0 * t)
+            return Quaternion.slerp(r, q, 2.0 * t - 1.0)
+        if sw < 1e-6 :
+            a, b = 1.0 - t, t
+        else :
+            a = math.sin((1.0 - t) * w) / sw
+            b = math.sin(t * w) / sw
+        res = Quaternion(
+            a*p.o + b*q.o,
+            a*p.i + b*q.i,
+            a*p.j + b*q.j,
+            a*p.k + b*q.k )
+        return res.unit() if sw < 1e-6 else res
+
+
     @staticmethod
     def isQuaternion(q) :
         """Is 'q' an instance of Quaternion"""
         return isinstance(q, Quaternion)
+
+
+class FrozenQuaternion(Quaternion) :
+    """
+    An immutable and hashable quaternion.
+    
+    Components of a FrozenQuaternion cannot be modified after it is created,
+    hence its norm, unit quaternion, conjugation, reciprocal and rotation
+    matrix are calculated when they are needed for the first time and cached.
+    Unit quaternion, conjugation and reciprocal are returned as instances
+    of FrozenQuaternion.
+    
+    It can be used wherever a Quaternion is expected. Arithmetic operators
+    return (mutable) instances of Quaternion, except the in-place operators
+    (+=, -=, *=) that return a new FrozenQuaternion.
+    """
+    
+    # Internal instance members:
+    # o, i, j, k - quaternion's components (see Quaternion)
+    # __cache - a dictionary with already calculated derived quantities
+    # __frozen - set to True when the quaternion's components are assigned
+
+    def __init__(self, o=0.0, i=0.0, j=0.0, k=0.0) :
+        """
+        A "constructor" that creates an instance of an immutable quaternion.
+        
+        Input:
+        o - scalar component of the quaternion (default: 0)
+        i - component 'i' of the quaternion (default: 0)
+        j - component 'j' of the quaternion (default: 0)
+        k - component 'k' of the quaternion (default: 0)
+        
+        Alternatively 'o' may be a quaternion. In this case, its components
+        are copied into self's ones and all other input arguments are ignored.
+        
+        A QuaternionException is raised if any argument is not an instance
+        of supported types (int, float, Quaternion).
+        """
+        
+        self.__frozen = False
+        self.__cache = {}
+        Quaternion.setQ(self, o, i, j, k)
+        self.__frozen = True
+
+
+    def __setattr__(self, name, value) :
+        # Blocks any modification of the quaternion, once it is created.
+        # This also covers all setters, inherited from Quaternion.
+        if self.__dict__.get("_FrozenQuaternion__frozen", False) :
+            raise QuaternionException("FrozenQuaternion cannot be modified")
+        self.__dict__[name] = value
+
+
+    def __iadd__(self, q) :
+        """Addition operator (+=), returns a new instance of FrozenQuaternion"""
+        return FrozenQuaternion(self + q)
+
+
+    def __isub__(self, q) :
+        """Subtraction operator (-=), returns a new instance of FrozenQuaternion"""
+        return FrozenQuaternion(self - q)
+
+
+    def __imul__(self, q) :
+        """Multiplication operator (*=), returns a new instance of FrozenQuaternion"""
+        return FrozenQuaternion(self * q)
+
+
+    def __eq__(self, q) :
+        """
+        Two frozen quaternions are equal if all their components are equal.
+        
+        Mutable quaternions are compared by identity (as they are hashed by it),
+        hence a FrozenQuaternion never equals a mutable Quaternion.
+        """
+        if not isinstance(q, FrozenQuaternion) :
+            return NotImplemented
+        return self.o == q.o and self.i == q.i and self.j == q.j and self.k == q.k
+
+
+    def __ne__(self, q) :
+        """Negation of __eq__"""
+        eq = self.__eq__(q)
+        return eq if eq is NotImplemented else not eq
+
+
+    def __hash__(self) :
+        """Hash of the quaternion's components, allows use as a dictionary key"""
+        return hash((self.o, self.i, self.j, self.k))
+
+
+    def __cached(self, key, func) :
+        # Returns the cached value of 'key', calculated by func() if not cached yet
+        try :
+            return self.__cache[key]
+        except KeyError :
+            val = func()
+            self.__cache[key] = val
+            return val
+
+
+    def conj(self) :
+        """Conjugation of a quaternion (cached), see Quaternion.conj"""
+        return self.__cached("conj",
+                    lambda : FrozenQuaternion(Quaternion.conj(self)))
+
+
+    def norm(self) :
+        """Norm of a quaternion (cached), see Quaternion.norm"""
+        return self.__cached("norm", lambda : Quaternion.norm(self))
+
+
+    def reciprocal(self) :
+        """Reciprocal of a quaternion (cached), see Quaternion.reciprocal"""
+        return self.__cached("reciprocal",
+                    lambda : FrozenQuaternion(Quaternion.reciprocal(self)))
+
+
+    def unit(self) :
+        """Unit quaternion of 'self' (cached), see Quaternion.unit"""
+        return self.__cached("unit",
+                    lambda : FrozenQuaternion(Quaternion.unit(self)))
+
+
+    def rotationMatrix(self) :
+        """Rotation matrix of the quaternion (cached), see Quaternion.rotationMatrix"""
+        return self.__cached("rotationMatrix",
+                    lambda : Quaternion.rotationMatrix(self))
+
+
+    def getMemoryUsage(self) :
+        """
+        Returns an estimate of the quaternion's memory (in bytes), i.e. of the
+        instance, its components and all cached values.
+        """
+        def sizeOf(v) :
+            # size of a cached value, a quaternion, a float or nested tuples
+            if isinstance(v, FrozenQuaternion) :
+                return v.getMemoryUsage()
+            if isinstance(v, tuple) :
+                return sys.getsizeof(v) + sum(sizeOf(e) for e in v)
+            return sys.getsizeof(v)
+        
+        return sys.getsizeof(self) + sys.getsizeof(self.__dict__) + \
+               sizeOf((self.o, self.i, self.j, self.k)) - sys.getsizeof(()) + \
+               sys.getsizeof(self.__cache) + sum(sizeOf(v) for v in self.__cache.values())
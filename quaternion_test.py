@@ -17,7 +17,7 @@
 
 from __future__ import print_function
 import sys
-from quaternion import Quaternion, QuaternionException
+from quaternion import Quaternion, FrozenQuaternion, QuaternionException, DriftMonitor
 
 """
 A collection of unit tests for quaternion arithmetics,
@@ -95,6 +95,40 @@ try:
     print("q*2+5 = {0}".format(q))
     q -= 5
     print("q*2+5-5 = {0}".format(q))
+    print()
+    
+    f = FrozenQuaternion(1, -2, 3, -4)
+    print("f = {0}".format(f))
+    print("||f|| = {0} (correct: 5.47723)".format(f.norm()))
+    print("f* = {0}".format(f.conj()))
+    print("f**(-1) = {0}".format(f.reciprocal()))
+    print("f*f**(-1) = {0}".format(f*f.reciprocal()))
+    print("Cached: {0}".format(f.unit() is f.unit() and f.conj() is f.conj()))
+    print("f == FrozenQuaternion(1, -2, 3, -4): {0}".format(f == FrozenQuaternion(1, -2, 3, -4)))
+    print("f == Quaternion(1, -2, 3, -4): {0} (expected: False, as Quaternion(1, -2, 3, -4) == f)".format(
+        f == Quaternion(1, -2, 3, -4)))
+    print("Usable as a dict key: {0}".format({f : "f"}[FrozenQuaternion(f)]))
+    print("p*f = {0}\tf*p = {1}".format(p*f, f*p))
+    print("Rotation matrix of f: {0}".format(f.rotationMatrix()))
+    try :
+        f.setScalar(2)
+        print("ERROR: a FrozenQuaternion was modified")
+    except QuaternionException :
+        print("f.setScalar(2) rejected, f = {0}".format(f))
+    g = f
+    g += 1
+    print("g = f+1 = {0}, f = {1}".format(g, f))
+    print()
+    
+    mon = DriftMonitor()
+    d = Quaternion(0.5, 0.5, 0.5, 0.50003)
+    for _ in range(3) :
+        d.renormalize(monitor=mon)
+        print("Renormalized: {0}, ||d||-1 = {1}".format(d, d.norm() - 1.0))
+    e = Quaternion(1, 2, 2, 4).renormalized(monitor=mon)
+    print("Renormalized far from unit: {0} (correct: 0.2+0.4i+0.4j+0.8k)".format(e))
+    print("Drift: {0} quaternions, max. deviation {1} (correct: 24), {2} exact".format(
+        mon.getCount(), mon.getMaxDeviation(), mon.getFallbackCount()))
     
 except QuaternionException as ex:
     print("\nQuaternion exception raised: '{0}'".format(ex), file=sys.stderr)
@@ -0,0 +1,203 @@
+# Copyright 2013, Jernej Kovacic
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+A module with vectorized generators of random rotations, e.g. for
+Monte Carlo simulations.
+
+Rotations are returned as NumPy arrays of shape (N,4) with unit rotation
+quaternions, ordered as (scalar, i, j, k). No Python object is created
+per sample. NumPy is imported when a generator is created.
+
+Author: Jernej Kovacic
+"""
+
+import math
+import numbers
+import exception
+import backend
+from quaternion import Quaternion, QuaternionException
+from rotation import Rotation
+from instance_checker import InstanceCheck
+
+
+class RandomRotationException(exception.IException) :
+    """Exception raised at illegal operations of random rotation generators"""
+    pass
+
+
+class RandomRotationGenerator() :
+    """
+    A seedable generator of random rotations.
+
+    Uniformly distributed rotations (w.r.t. the Haar measure on SO(3)) are
+    generated by Shoemake's method, see:
+    K. Shoemake, "Uniform random rotations", Graphics Gems III, 1992
+    """
+
+    # Private internal instance members:
+    # __np - the numpy module
+    # __rng - NumPy's random generator
+
+    def __init__(self, seed=None) :
+        """
+        A "constructor" that initializes the generator.
+
+        Input:
+        seed - an integer seed, an instance of numpy.random.Generator
+               or None for a nondeterministic seed (default: None)
+
+        A RandomRotationException is raised if NumPy is not installed.
+        """
+        try :
+            self.__np = backend.numpy()
+        except backend.BackendException as bex :
+            raise RandomRotationException("Random rotations require NumPy: '{0}'".format(bex))
+        if isinstance(seed, self.__np.random.Generator) :
+            self.__rng = seed
+        else :
+            self.__rng = self.__np.random.default_rng(seed)
+
+    def getGenerator(self) :
+        """Returns the underlying numpy.random.Generator"""
+        return self.__rng
+
+    def __checkCount(self, n) :
+        # Checks the number of requested samples
+        if not isinstance(n, numbers.Integral) or n < 0 :
+            raise RandomRotationException("Number of samples must be a non-negative integer")
+
+    def uniform(self, n, out=None) :
+        """
+        Generates uniformly distributed random rotations.
+
+        Input:
+        n - number of rotations
+        out - an optional array of shape (n,4) where the quaternions are written into
+
+        Return:
+        an array of shape (n,4) with unit rotation quaternions
+
+        A RandomRotationException is raised if any argument is invalid.
+        """
+        self.__checkCount(n)
+        np = self.__np
+        if out is None :
+            out = np.empty((n, 4))
+        elif out.shape != (n, 4) :
+            raise RandomRotationException("'out' must be an array of shape (n,4)")
+
+        # Shoemake's method:
+        # q = ( sqrt(u1)*cos(2*pi*u3), sqrt(1-u1)*sin(2*pi*u2),
+        #       sqrt(1-u1)*cos(2*pi*u2), sqrt(u1)*sin(2*pi*u3) )
+        # where u1, u2 and u3 are uniformly distributed in [0, 1).
+        # Each row of 'u' belongs to one sample, so the first rotations
+        # do not depend on 'n'.
+        u = self.__rng.random((n, 3))
+        r1 = np.sqrt(1.0 - u[:, 0])
+        r2 = np.sqrt(u[:, 0])
+        a1 = 2.0 * math.pi * u[:, 1]
+        a2 = 2.0 * math.pi * u[:, 2]
+        np.multiply(r2, np.cos(a2), out=out[:, 0])
+        np.multiply(r1, np.sin(a1), out=out[:, 1])
+        np.multiply(r1, np.cos(a1), out=out[:, 2])
+        np.multiply(r2, np.sin(a2), out=out[:, 3])
+        return out
+
+    def __angles(self, n, spread, distribution) :
+        # Rotation vectors (axis * angle) of perturbations, an array of shape (n,3)
+        np = self.__np
+        rng = self.__rng
+
+        if distribution == "normal" :
+            # isotropic normal distribution of the rotation vector
+            return rng.normal(0.0, spread, (n, 3))
+
+        if distribution == "uniform" :
+            # uniform distribution (w.r.t. the Haar measure) of all rotations
+            # with angles up to 'spread', i.e. the angle's density is
+            # proportional to 1-cos(angle). Angles are sampled by rejection.
+            angles = np.empty(n)
+            filled = 0
+            pmax = 1.0 - math.cos(spread)
+            while filled < n :
+                m = n - filled
+                cand = rng.uniform(0.0, spread, 2*m + 16)
+                acc = cand[rng.random(cand.size) * pmax <= 1.0 - np.cos(cand)][:m]
+                angles[filled:filled + acc.size] = acc
+                filled += acc.size
+            axes = rng.standard_normal((n, 3))
+            axes /= np.linalg.norm(axes, axis=1)[:, None]
+            return axes * angles[:, None]
+
+        raise RandomRotationException("Unknown distribution '{0}'".format(distribution))
+
+    def perturb(self, q, n, spread, distribution="normal", out=None) :
+        """
+        Generates random rotations in the vicinity of a rotation 'q',
+        i.e. q * dq, where 'dq' is a random rotation with a small angle.
+
+        Input:
+        q - a rotation (an instance of Rotation or a rotation quaternion)
+        n - number of rotations
+        spread - angular spread in radians:
+                 standard deviation of each component of the perturbation's
+                 rotation vector if 'distribution' is "normal",
+                 maximum angle of the perturbation if 'distribution' is "uniform"
+        distribution - "normal" or "uniform" (default: "normal")
+        out - an optional array of shape (n,4) where the quaternions are written into
+
+        Return:
+        an array of shape (n,4) with unit rotation quaternions
+
+        A RandomRotationException is raised if any argument is invalid.
+        """
+        self.__checkCount(n)
+        if isinstance(q, Rotation) :
+            q = q.getRotationQuaternion()
+        if not Quaternion.isQuaternion(q) :
+            raise RandomRotationException("'q' must be an instance of Rotation or Quaternion")
+        if not InstanceCheck.isFloat(spread) or spread < 0.0 :
+            raise RandomRotationException("Spread must be a non-negative float")
+        if distribution == "uniform" and spread > math.pi :
+            raise RandomRotationException("Maximum angle must not exceed pi")
+        try :
+            q = q.unit()
+        except QuaternionException as qex :
+            raise RandomRotationException("Invalid rotation quaternion: '{0}'".format(qex))
+
+        np = self.__np
+        if out is None :
+            out = np.empty((n, 4))
+        elif out.shape != (n, 4) :
+            raise RandomRotationException("'out' must be an array of shape (n,4)")
+
+        # dq = cos(|w|/2) + sin(|w|/2) * w/|w|, where 'w' is the rotation vector
+        w = self.__angles(n, float(spread), distribution)
+        ang = np.linalg.norm(w, axis=1)
+        half = 0.5 * ang
+        # sin(|w|/2)/|w|, with its limit 1/2 for small angles
+        s = np.where(ang > Quaternion.eps, np.sin(half) / np.maximum(ang, Quaternion.eps), 0.5)
+        dq = np.empty((n, 4))
+        dq[:, 0] = np.cos(half)
+        dq[:, 1:] = w * s[:, None]
+
+        # out = q * dq, for the formula see Quaternion.__mul__
+        o, i, j, k = q.o, q.i, q.j, q.k
+        a, b, c, d = dq[:, 0], dq[:, 1], dq[:, 2], dq[:, 3]
+        out[:, 0] = o*a - i*b - j*c - k*d
+        out[:, 1] = o*b + i*a + j*d - k*c
+        out[:, 2] = o*c - i*d + j*a + k*b
+        out[:, 3] = o*d + i*c - j*b + k*a
+        return out
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+
+# Copyright 2013, Jernej Kovacic
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+import math
+import sys
+import numpy as np
+from rotation import Rotation
+from random_rotation import RandomRotationGenerator, RandomRotationException
+
+
+"""
+A collection of unit tests for random rotation generators,
+implemented by random_rotation.RandomRotationGenerator.
+"""
+
+try :
+    n = 1000000
+    gen = RandomRotationGenerator(seed=42)
+    q = gen.uniform(n)
+    print("Max. deviation of norms from 1: {0}".format(np.abs(np.linalg.norm(q, axis=1) - 1.0).max()))
+    # For uniformly distributed rotations, E[q*q^T] = I/4
+    print("E[q*q^T] (expected: I/4):\n{0}".format(q.T.dot(q) / n))
+    # Angle of a uniform rotation has density (1-cos(a))/pi, its mean equals pi/2 + 2/pi
+    ang = 2.0 * np.arccos(np.minimum(np.abs(q[:, 0]), 1.0))
+    print("Mean angle: {0} (expected: {1})".format(ang.mean(), math.pi/2 + 2/math.pi))
+    same = RandomRotationGenerator(seed=42).uniform(3)
+    print("Same seed, same rotations: {0}".format(np.array_equal(same, q[:3])))
+    print()
+
+    rot = Rotation(2, -3, 1, Rotation.deg2rad(30))
+    sigma = 0.01
+    p = gen.perturb(rot, n, sigma)
+    rq = rot.getRotationQuaternion()
+    dots = np.abs(p.dot([rq.o, rq.i, rq.j, rq.k]))
+    dang = 2.0 * np.arccos(np.minimum(dots, 1.0))
+    print("Mean angle from the rotation: {0} (expected: {1})".format(dang.mean(), sigma * math.sqrt(8/math.pi)))
+    p = gen.perturb(rot, n, 0.1, "uniform")
+    dots = np.abs(p.dot([rq.o, rq.i, rq.j, rq.k]))
+    dang = 2.0 * np.arccos(np.minimum(dots, 1.0))
+    print("Max. angle from the rotation: {0} (expected: at most 0.1)".format(dang.max()))
+
+except RandomRotationException as ex:
+    print("\nRandom rotation exception raised: '{0}'".format(ex), file=sys.stderr)
+else :
+    print("\nRandom rotation test completed successfully.")
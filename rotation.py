@@ -21,7 +21,7 @@ Author: Jernej Kovacic
 
 import math
 import exception
-from quaternion import Quaternion, QuaternionException
+from quaternion import Quaternion, FrozenQuaternion, QuaternionException
 from instance_checker import InstanceCheck
 
         
@@ -157,7 +157,7 @@ class Rotation() :
     # Private internal instance members:
     # __r - a vector representing the axis of ratoation (Point3D)
     # __theta - angle of rotation (in radians)
-    # __q - roatation quaternion
+    # __q - roatation quaternion (FrozenQuaternion)
     
     def __init__(self, rx=0.0, ry=0.0, rz=0.0, angle=0.0) :
         """
@@ -242,8 +242,12 @@ class Rotation() :
             # Calculate the rotation quaternion, depending on rot. vector and angle:
             # For more info, see::
             # http://en.wikipedia.org/wiki/Quaternions_and_spatial_rotation
-            self.__q *= math.sin(0.5*self.__theta)
-            self.__q += math.cos(0.5*self.__theta)
+            q = self.__q * math.sin(0.5*self.__theta)
+            q += math.cos(0.5*self.__theta)
+            
+            # The quaternion is frozen, so it can be safely returned by
+            # getRotationQuaternion() and its conjugation is only computed once.
+            self.__q = FrozenQuaternion(q)
 
         except QuaternionException as qex :
             raise RotationException("Could not generate a rotation quaternion: '{0}'".format(qex))
@@ -265,7 +269,7 @@ class Rotation() :
         return self.__theta
     
     def getRotationQuaternion(self) :
-        """Returns a rotation quaternion."""
+        """Returns a rotation quaternion (an immutable instance of FrozenQuaternion)."""
         return self.__q
         
     def rotate(self, p) :
@@ -293,6 +297,83 @@ class Rotation() :
                         pqr.getK() )        
         
         
+    def inverse(self) :
+        """
+        Returns the inverse rotation (an instance of Rotation), i.e. the
+        rotation around the same axis by the negated angle.
+        
+        The rotation quaternion of the inverse is the (cached) conjugation
+        of this one's, so no trigonometric function is evaluated.
+        """
+        inv = Rotation.__new__(Rotation)
+        inv.__r = Point3D(self.__r)
+        inv.__theta = -self.__theta
+        inv.__q = self.__q.conj()
+        return inv
+        
+        
+    def rotateInverse(self, p) :
+        """
+        Performs the inverse rotation of a point or of a batch of points,
+        i.e. undoes rotate().
+        
+        Input:
+        - p - a point to be rotated (an instance of Point3D) or a batch
+              of points (see batch.rotateInverse)
+        
+        Returns coordinates of the rotated point (an instance of Point3D)
+        or a batch of rotated points.
+        
+        The inverse rotation matrix is the transpose of the cached rotation
+        matrix of the quaternion, so no new rotation is created.
+        
+        A RotationException is raised if 'p' is not an instance of Point3D
+        or a valid batch.
+        """
+        if not Point3D.isPoint3D(p) :
+            # imported here as the module batch depends on this one
+            import batch
+            try :
+                return batch.rotateInverse(self, p)
+            except batch.BatchException as bex :
+                raise RotationException("Invalid batch of points: '{0}'".format(bex))
+        
+        # columns of the matrix are rows of its transpose
+        m0, m1, m2 = self.__q.rotationMatrix()
+        x, y, z = p.x, p.y, p.z
+        return Point3D( m0[0]*x + m1[0]*y + m2[0]*z,
+                        m0[1]*x + m1[1]*y + m2[1]*z,
+                        m0[2]*x + m1[2]*y + m2[2]*z )
+        
+        
+    @staticmethod
+    def fromQuaternion(q) :
+        """
+        Creates a rotation, represented by the quaternion 'q'.
+        
+        Input:
+        - q - a rotation quaternion (an instance of Quaternion), it will
+              automatically be converted into a unit quaternion
+        
+        Returns an instance of Rotation. If 'q' represents no rotation,
+        the axis of rotation is set to the z-axis.
+        
+        A RotationException is raised if 'q' is not a quaternion or its norm equals 0.
+        """
+        if not Quaternion.isQuaternion(q) :
+            raise RotationException("Input must be an instance of Quaternion")
+        try :
+            u = q.unit()
+        except QuaternionException as qex :
+            raise RotationException("Invalid rotation quaternion: '{0}'".format(qex))
+        
+        # q = cos(theta/2) + sin(theta/2) * (rx*i + ry*j + rz*k)
+        s = math.sqrt(u.i*u.i + u.j*u.j + u.k*u.k)
+        if s < Quaternion.eps :
+            return Rotation(rz=1.0)
+        return Rotation(u.i, u.j, u.k, 2.0 * math.atan2(s, u.o))
+        
+        
     @staticmethod    
     def deg2rad(deg) :
         """Conversion from angle degrees to radians"""
@@ -302,3 +383,10 @@ class Rotation() :
     def rad2deg(rad) :
         """Conversion from radians to angle degrees"""
         return rad*180.0/math.pi
+
+
+if __name__ == "__main__" :
+    # 'python -m rotation' runs the command line tool, see rotation_cli
+    import sys
+    import rotation_cli
+    sys.exit(rotation_cli.main())
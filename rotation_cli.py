@@ -0,0 +1,347 @@
+# Copyright 2013, Jernej Kovacic
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+A command line tool that rotates points, stored in text files, run as:
+    python -m rotation [options] FILE [FILE ...]
+
+Supported formats are CSV (comma separated values, optionally with
+a header line), XYZ (whitespace separated values, one point per line)
+and ASCII PLY. Lines are processed in chunks: rotated columns are parsed
+into NumPy arrays, rotated by the NumPy backend and written out before
+the next chunk is read, so the memory does not depend on files' sizes.
+
+Columns x, y and z are rotated. If a CSV or a PLY header names columns
+nx, ny and nz (normals), they are rotated as well. Rotated values are
+written with the shortest representation that is parsed back to the same
+float, unless a precision is given. Other columns are copied as they are
+written in the input, other PLY elements (e.g. faces) are copied as well.
+Comments and blank lines of CSV and XYZ files are skipped.
+
+Several files may be processed in parallel by separate processes.
+
+Author: Jernej Kovacic
+"""
+
+from __future__ import print_function
+import argparse
+import itertools
+import os
+import shutil
+import sys
+
+import exception
+import backend
+from quaternion import Quaternion
+from rotation import Rotation, RotationException
+
+
+class RotationCliException(exception.IException) :
+    """Exception raised at invalid input of the command line tool"""
+    pass
+
+
+# Default number of lines, parsed at once
+DEFAULT_CHUNK = 65536
+
+# Default number of significant digits of rotated values,
+# None for the shortest representation that round-trips exactly
+DEFAULT_PRECISION = None
+
+# Formats, recognized by files' extensions, other files are read as XYZ
+_EXTENSIONS = { ".csv" : "csv", ".xyz" : "xyz", ".txt" : "xyz", ".ply" : "ply" }
+
+
+def _triples(names) :
+    # Column indices of coordinates (and normals) for the given column names
+    lower = [ n.strip().lower() for n in names ]
+    res = []
+    for triple in (("x", "y", "z"), ("nx", "ny", "nz")) :
+        if all(c in lower for c in triple) :
+            res.append([ lower.index(c) for c in triple ])
+    if not res :
+        raise RotationCliException("Columns x, y and z not found")
+    return res
+
+
+def _isHeader(fields) :
+    # Does a line name columns x, y and z?
+    lower = [ f.strip().lower() for f in fields ]
+    return all(c in lower for c in ("x", "y", "z"))
+
+
+def _dataLines(f) :
+    # Lines of a CSV or an XYZ file without blank lines and comments
+    for line in f :
+        s = line.strip()
+        if s and not s.startswith("#") :
+            yield line
+
+
+class _ChunkRotator() :
+    # Parses the given column triples of chunks of lines into arrays,
+    # rotates them and writes the chunks out, other fields are unchanged.
+
+    def __init__(self, m, delimiter, triples, precision) :
+        self.__be = backend.getBackend("numpy")
+        self.__np = self.__be.np
+        self.__m = self.__np.array(m)
+        self.__delimiter = delimiter
+        self.__triples = triples
+        if precision is None :
+            self.__fmt = repr
+        else :
+            fmt = "%.{0}g".format(precision)
+            self.__fmt = lambda v : fmt % v
+
+    def process(self, lines, fout) :
+        # Rotates points of all 'lines' and writes them into 'fout',
+        # returns the number of points
+        np = self.__np
+        if not lines :
+            return 0
+        rows = [ line.rstrip("\r\n").split(self.__delimiter) for line in lines ]
+        n = len(rows)
+        pts = np.empty((n, 3))
+        for t in self.__triples :
+            try :
+                data = np.array([ [ r[c] for c in t ] for r in rows ], dtype=float)
+            except IndexError :
+                raise RotationCliException("Too few columns: {0}".format(
+                        min(len(r) for r in rows)))
+            except ValueError as ex :
+                raise RotationCliException("Invalid data: {0}".format(ex))
+            self.__be.rotate(self.__m, data, pts, 0, n)
+            for r, p in zip(rows, pts.tolist()) :
+                for c, v in zip(t, p) :
+                    r[c] = self.__fmt(v)
+        sep = "," if self.__delimiter == "," else " "
+        fout.writelines(sep.join(r) + "\n" for r in rows)
+        return n
+
+
+def _rotateDelimited(m, fin, fout, fmt, chunk, precision) :
+    # Rotates points of a CSV or an XYZ file, returns the number of points
+    lines = _dataLines(fin)
+    first = next(lines, None)
+    if first is None :
+        return 0
+
+    delimiter = "," if fmt == "csv" else None
+    fields = first.split(delimiter)
+    if fmt == "csv" and _isHeader(fields) :
+        triples = _triples(fields)
+        fout.write(first)
+    else :
+        triples = [ [0, 1, 2] ]
+        lines = itertools.chain([ first ], lines)
+
+    rot = _ChunkRotator(m, delimiter, triples, precision)
+    n = 0
+    while True :
+        block = list(itertools.islice(lines, chunk))
+        if not block :
+            return n
+        n += rot.process(block, fout)
+
+
+def _rotatePly(m, fin, fout, chunk, precision) :
+    # Rotates vertices of an ASCII PLY file, returns the number of vertices
+    header = [ fin.readline() ]
+    if header[0].strip() != "ply" :
+        raise RotationCliException("Not a PLY file")
+    ascii, elements, names = False, [], []
+    while True :
+        line = fin.readline()
+        if not line :
+            raise RotationCliException("Unterminated PLY header")
+        header.append(line)
+        words = line.split()
+        if not words :
+            continue
+        if words[0] == "format" :
+            ascii = words[1:2] == [ "ascii" ]
+        elif words[0] == "element" and len(words) == 3 :
+            elements.append((words[1], int(words[2])))
+        elif words[0] == "property" and elements and elements[-1][0] == "vertex" :
+            if words[1] == "list" :
+                raise RotationCliException("List properties of vertices are not supported")
+            names.append(words[-1])
+        elif words[0] == "end_header" :
+            break
+    if not ascii :
+        raise RotationCliException("Only ASCII PLY files are supported")
+    if not elements or elements[0][0] != "vertex" :
+        raise RotationCliException("Vertices must be the first element of a PLY file")
+
+    rot = _ChunkRotator(m, None, _triples(names), precision)
+    fout.writelines(header)
+    count = elements[0][1]
+    n = 0
+    while n < count :
+        block = list(itertools.islice(fin, min(chunk, count - n)))
+        if not block :
+            raise RotationCliException("Unexpected end of file after {0} vertices".format(n))
+        n += rot.process(block, fout)
+    # other elements are copied
+    shutil.copyfileobj(fin, fout)
+    return n
+
+
+def rotateFile(rot, src, dst, fmt=None, chunk=DEFAULT_CHUNK, precision=DEFAULT_PRECISION) :
+    """
+    Rotates all points of a text file.
+
+    Input:
+    rot - an instance of Rotation or a rotation quaternion
+    src - path of the input file or a file object, opened for reading
+    dst - path of the output file or a file object, opened for writing
+    fmt - "csv", "xyz", "ply" or None to determine the format by the
+          extension of 'src' (default: None)
+    chunk - number of lines, parsed at once (default: DEFAULT_CHUNK)
+    precision - number of significant digits of rotated values or None
+                for the shortest exact representation (default: DEFAULT_PRECISION)
+
+    Return:
+    number of rotated points
+
+    A RotationCliException is raised if any argument or the file is invalid
+    or NumPy is not installed.
+    """
+    if isinstance(rot, Rotation) :
+        rot = rot.getRotationQuaternion()
+    if not Quaternion.isQuaternion(rot) :
+        raise RotationCliException("'rot' must be an instance of Rotation or Quaternion")
+    if not isinstance(chunk, int) or chunk < 1 :
+        raise RotationCliException("Chunk size must be a positive integer")
+    if precision is not None and (not isinstance(precision, int) or precision < 1) :
+        raise RotationCliException("Precision must be a positive integer or None")
+    if fmt is None :
+        name = src if isinstance(src, str) else getattr(src, "name", "")
+        fmt = _EXTENSIONS.get(os.path.splitext(str(name))[1].lower(), "xyz")
+    if fmt not in ("csv", "xyz", "ply") :
+        raise RotationCliException("Unknown format '{0}'".format(fmt))
+    try :
+        backend.numpy()
+    except backend.BackendException as bex :
+        raise RotationCliException("The tool requires NumPy: '{0}'".format(bex))
+    m = rot.rotationMatrix()
+
+    fin = open(src, "r") if isinstance(src, str) else src
+    try :
+        fout = open(dst, "w") if isinstance(dst, str) else dst
+        try :
+            if fmt == "ply" :
+                return _rotatePly(m, fin, fout, chunk, precision)
+            return _rotateDelimited(m, fin, fout, fmt, chunk, precision)
+        finally :
+            if fout is not dst :
+                fout.close()
+    finally :
+        if fin is not src :
+            fin.close()
+
+
+def _job(args) :
+    # Rotates one file, executed by a worker process.
+    # Returns the number of points or an error message.
+    q, src, dst, fmt, chunk, precision = args
+    try :
+        return rotateFile(Quaternion(*q), src, dst, fmt, chunk, precision), None
+    except (RotationCliException, IOError, OSError) as ex :
+        return 0, str(ex)
+
+
+def _parser() :
+    # Parser of command line arguments
+    p = argparse.ArgumentParser(prog="python -m rotation",
+            description="Rotates points of CSV, XYZ or ASCII PLY files.")
+    p.add_argument("files", nargs="+", metavar="FILE",
+            help="input files, '-' for the standard input")
+    p.add_argument("--axis", nargs=3, type=float, metavar=("X", "Y", "Z"),
+            default=[0.0, 0.0, 1.0], help="axis of rotation (default: 0 0 1)")
+    p.add_argument("--angle", type=float, default=0.0,
+            help="angle of rotation, in radians unless --degrees is given")
+    p.add_argument("--degrees", action="store_true",
+            help="the angle is given in degrees")
+    p.add_argument("--quaternion", nargs=4, type=float, metavar=("O", "I", "J", "K"),
+            help="rotation quaternion, instead of --axis and --angle")
+    p.add_argument("--format", choices=("csv", "xyz", "ply"),
+            help="format of input files (default: by extension)")
+    p.add_argument("-o", "--output",
+            help="output file of a single input file (default: the standard output)")
+    p.add_argument("-d", "--output-dir",
+            help="directory of output files, named as input files")
+    p.add_argument("-j", "--jobs", type=int, default=1,
+            help="number of files, processed in parallel (default: 1)")
+    p.add_argument("--chunk", type=int, default=DEFAULT_CHUNK,
+            help="number of lines, parsed at once (default: {0})".format(DEFAULT_CHUNK))
+    p.add_argument("--precision", type=int, default=DEFAULT_PRECISION,
+            help="significant digits of rotated values (default: the shortest exact representation)")
+    return p
+
+
+def main(argv=None) :
+    """
+    Runs the command line tool with arguments 'argv'
+    (default: sys.argv[1:]) and returns the exit status.
+    """
+    parser = _parser()
+    args = parser.parse_args(argv)
+
+    try :
+        if args.quaternion is not None :
+            rot = Rotation.fromQuaternion(Quaternion(*args.quaternion))
+        else :
+            angle = Rotation.deg2rad(args.angle) if args.degrees else args.angle
+            rot = Rotation(args.axis[0], args.axis[1], args.axis[2], angle)
+    except RotationException as rex :
+        parser.error("invalid rotation: {0}".format(rex))
+    if args.chunk < 1 or args.jobs < 1 :
+        parser.error("--chunk and --jobs must be positive")
+    if args.precision is not None and args.precision < 1 :
+        parser.error("--precision must be positive")
+    if args.output is not None and (args.output_dir is not None or len(args.files) > 1) :
+        parser.error("--output requires a single input file and no --output-dir")
+    if len(args.files) > 1 and args.output_dir is None :
+        parser.error("several input files require --output-dir")
+
+    jobs = []
+    for src in args.files :
+        if args.output_dir is not None :
+            if src == "-" :
+                parser.error("the standard input requires --output or no output option")
+            dst = os.path.join(args.output_dir, os.path.basename(src))
+            if os.path.exists(dst) and os.path.samefile(src, dst) :
+                parser.error("output would overwrite '{0}'".format(src))
+        else :
+            dst = args.output if args.output is not None else sys.stdout
+        jobs.append((src if src != "-" else sys.stdin, dst))
+
+    q = rot.getRotationQuaternion()
+    params = [ ((q.o, q.i, q.j, q.k), src, dst, args.format, args.chunk, args.precision)
+               for src, dst in jobs ]
+    if args.jobs > 1 and len(params) > 1 :
+        import concurrent.futures
+        with concurrent.futures.ProcessPoolExecutor(min(args.jobs, len(params))) as pool :
+            results = list(pool.map(_job, params))
+    else :
+        results = [ _job(p) for p in params ]
+
+    status = 0
+    for src, (n, err) in zip(args.files, results) :
+        if err is not None :
+            print("{0}: {1}".format(src, err), file=sys.stderr)
+            status = 1
+    return status
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+
+# Copyright 2013, Jernej Kovacic
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import numpy as np
+from rotation import Rotation, Point3D
+from rotation_cli import rotateFile, main, RotationCliException
+
+
+"""
+A collection of unit tests for the command line tool, implemented
+by rotation_cli and run as 'python -m rotation'.
+"""
+
+def maxError(rot, src, dst) :
+    """Maximum difference between points of 'dst' and rotated points of 'src' (arrays (N,3))"""
+    err = 0.0
+    for a, b in zip(src, dst) :
+        p = rot.rotate(Point3D(float(a[0]), float(a[1]), float(a[2])))
+        err = max(err, abs(p.x - b[0]), abs(p.y - b[1]), abs(p.z - b[2]))
+    return err
+
+
+tmp = tempfile.mkdtemp()
+try :
+    rng = np.random.default_rng(5)
+    rot = Rotation(1, 2, 3, Rotation.deg2rad(40))
+    pts = rng.uniform(-100.0, 100.0, (1000, 3))
+
+    # XYZ with an extra column, comments and blank lines; small chunks
+    xyz = os.path.join(tmp, "points.xyz")
+    with open(xyz, "w") as f :
+        f.write("# a comment\n\n")
+        for idx, p in enumerate(pts.tolist()) :
+            f.write("{0!r} {1!r} {2!r} {3}\n".format(p[0], p[1], p[2], idx))
+    out = os.path.join(tmp, "points_rot.xyz")
+    n = rotateFile(rot, xyz, out, chunk=64)
+    res = np.loadtxt(out)
+    print("XYZ: {0} points, max. error {1}".format(n, maxError(rot, pts, res[:, :3])))
+    print("Extra column preserved: {0}".format((res[:, 3] == np.arange(1000)).all()))
+
+    # other columns are copied as they are written, e.g. timestamps and labels
+    ids = os.path.join(tmp, "ids.xyz")
+    with open(ids, "w") as f :
+        f.write("1.5 -2.25 3.0 1700000000123456789 345678.123456789 label\n")
+    out = os.path.join(tmp, "ids_rot.xyz")
+    rotateFile(Rotation(0, 0, 1, 0.0), ids, out)
+    with open(out) as f :
+        print("Untouched columns (identity): {0}".format(f.read().strip()))
+
+    # CSV with a header, normals are rotated as well
+    csv = os.path.join(tmp, "points.csv")
+    nrm = pts / np.linalg.norm(pts, axis=1)[:, None]
+    with open(csv, "w") as f :
+        f.write("id,X,Y,Z,nx,ny,nz\n")
+        for idx in range(pts.shape[0]) :
+            f.write(",".join([ str(idx) ] + [ repr(float(v)) for v in pts[idx] ] +
+                             [ repr(float(v)) for v in nrm[idx] ]) + "\n")
+    out = os.path.join(tmp, "points_rot.csv")
+    n = rotateFile(rot.getRotationQuaternion(), csv, out, chunk=100, precision=17)
+    with open(out) as f :
+        print("CSV header: {0}".format(f.readline().strip()))
+    res = np.loadtxt(out, delimiter=",", skiprows=1)
+    print("CSV: {0} points, max. error of points {1}, of normals {2}".format(
+        n, maxError(rot, pts, res[:, 1:4]), maxError(rot, nrm, res[:, 4:7])))
+
+    # ASCII PLY with faces
+    ply = os.path.join(tmp, "mesh.ply")
+    with open(ply, "w") as f :
+        f.write("ply\nformat ascii 1.0\nelement vertex 4\nproperty float x\n"
+                "property float y\nproperty float z\nproperty uchar red\n"
+                "element face 2\nproperty list uchar int vertex_indices\nend_header\n")
+        for p in pts[:4].tolist() :
+            f.write("{0!r} {1!r} {2!r} 255\n".format(p[0], p[1], p[2]))
+        f.write("3 0 1 2\n3 0 2 3\n")
+    out = os.path.join(tmp, "mesh_rot.ply")
+    n = rotateFile(rot, ply, out, chunk=3, precision=17)
+    with open(out) as f :
+        lines = f.read().splitlines()
+    res = np.loadtxt(lines[10:14])
+    print("PLY: {0} vertices, max. error {1}".format(n, maxError(rot, pts[:4], res[:, :3])))
+    print("PLY colours and faces: {0}".format(lines[10].split()[3:] + lines[14:]))
+
+    # command line, several files in parallel
+    outDir = os.path.join(tmp, "out")
+    os.mkdir(outDir)
+    status = main([ "--axis", "1", "2", "3", "--angle", "40", "--degrees",
+                    "-j", "2", "-d", outDir, xyz, csv ])
+    res = np.loadtxt(os.path.join(outDir, "points.xyz"))
+    print("Command line: status {0}, max. error {1}".format(status, maxError(rot, pts, res[:, :3])))
+
+    q = rot.getRotationQuaternion()
+    here = os.path.dirname(os.path.abspath(__file__))
+    res = subprocess.check_output(
+            [ sys.executable, "-m", "rotation", "--quaternion",
+              repr(q.o), repr(q.i), repr(q.j), repr(q.k), "--precision", "17", xyz ],
+            cwd=here, universal_newlines=True )
+    res = np.loadtxt(res.splitlines())
+    print("python -m rotation: max. error {0}".format(maxError(rot, pts, res[:, :3])))
+
+    # an invalid file
+    bad = os.path.join(tmp, "bad.xyz")
+    with open(bad, "w") as f :
+        f.write("1 2 3\n4 five 6\n")
+    try :
+        rotateFile(rot, bad, os.path.join(tmp, "bad_rot.xyz"))
+        print("Invalid data: no exception raised")
+    except RotationCliException as ex :
+        print("Invalid data: exception raised as expected: {0}".format(ex))
+
+except RotationCliException as ex:
+    print("\nRotation CLI exception raised: '{0}'".format(ex), file=sys.stderr)
+else :
+    print("\nRotation CLI test completed successfully.")
+finally :
+    shutil.rmtree(tmp)
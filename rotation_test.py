@@ -62,6 +62,20 @@ try :
     # Calculated using Maxima and the following package:
     # https://github.com/jkovacic/maxima-ht
     print("Expected: (7.856793583014213, 3.917644837685909, -0.9606526529707)")
+    print()
+    
+    rq = Rotation.fromQuaternion(rot.getRotationQuaternion())
+    print("Rotation from its quaternion: axis {0}, angle {1} rad".format(rq.getAxis(), rq.getAngle()))
+    print("Expected: (0.53452, -0.80178, 0.26726), {0}".format(math.pi/6))
+    print()
+    
+    inv = rot.inverse()
+    print("Inverse rotation: axis {0}, angle {1} rad".format(inv.getAxis(), inv.getAngle()))
+    print("Inverse quaternion: {0}".format(inv.getRotationQuaternion()))
+    print("{0} --> {1} (expected: {2})".format(tp, inv.rotate(tp), p))
+    print("Inverse rotation of {0}: {1} (expected: {2})".format(tp, rot.rotateInverse(tp), p))
+    print("Batch: {0}".format(rot.rotateInverse([[tp.x, tp.y, tp.z], [1, 0, 0]])))
+    print("Expected: {0}, {1}".format(p, inv.rotate(Point3D(1, 0, 0))))
 
 except RotationException as ex:
     print("\nRotation exception raised: '{0}'".format(ex), file=sys.stderr)
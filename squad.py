@@ -0,0 +1,268 @@
+# Copyright 2013, Jernej Kovacic
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+A module with orientation keyframe tracks, interpolated by spherical
+quadrangle interpolation (SQUAD).
+
+For more information about SQUAD, see:
+K. Shoemake, "Animating rotation with quaternion curves", SIGGRAPH 1985
+and
+E. B. Dam et al., "Quaternions, Interpolation and Animation", 1998
+
+Author: Jernej Kovacic
+"""
+
+import bisect
+import exception
+import backend
+from quaternion import Quaternion, FrozenQuaternion, QuaternionException
+from rotation import Rotation
+from instance_checker import InstanceCheck
+
+
+class SquadException(exception.IException) :
+    """Exception raised at illegal operations with keyframe tracks"""
+    pass
+
+
+def _slerpArrays(np, p, q, h) :
+    # Row-wise SLERP between arrays of unit quaternions 'p' and 'q' (N,4)
+    # at parameters 'h' (N,), see Quaternion.slerp
+    dot = np.einsum("ij,ij->i", p, q)
+    np.clip(dot, -1.0, 1.0, out=dot)
+    w = np.arccos(dot)
+    sw = np.sin(w)
+    near = sw < 1e-6
+    sw[near] = 1.0
+    a = np.where(near, 1.0 - h, np.sin((1.0 - h) * w) / sw)
+    b = np.where(near, h, np.sin(h * w) / sw)
+    res = a[:, None] * p + b[:, None] * q
+    if near.any() :
+        opposite = near & (dot < 0.0)
+        if opposite.any() :
+            # the path passes r, orthogonal to p, each half is a quarter circle
+            po, qo, ho = p[opposite], q[opposite], h[opposite]
+            r = po[:, [1, 0, 3, 2]] * (-1.0, 1.0, -1.0, 1.0)
+            first = (ho <= 0.5)[:, None]
+            s = np.where(ho <= 0.5, ho, ho - 0.5) * np.pi
+            res[opposite] = (np.cos(s)[:, None] * np.where(first, po, r) +
+                             np.sin(s)[:, None] * np.where(first, r, qo))
+        # linear interpolation of very close quaternions is normalized
+        res[near] /= np.linalg.norm(res[near], axis=1)[:, None]
+    return res
+
+
+class KeyframeTrack() :
+    """
+    A track of orientation keyframes, i.e. pairs of times and unit rotation
+    quaternions, with strictly increasing times.
+
+    SQUAD control quaternions are precomputed when keyframes are appended.
+    Appending a keyframe only recomputes the control quaternion of the
+    previous last keyframe. Segments are found by a binary search.
+
+    At the first and the last keyframe, control quaternions equal the
+    keyframes themselves. Times outside the track are clamped to its ends.
+    """
+
+    # Private internal instance members:
+    # __t - a list of keyframes' times (floats)
+    # __q - a list of keyframes' unit quaternions (FrozenQuaternion)
+    # __s - a list of SQUAD control quaternions (FrozenQuaternion)
+    # __arr - arrays (times, keyframes, control quaternions) for vectorized
+    #         evaluation, allocated with spare capacity
+    # __synced - number of leading keyframes whose rows in __arr are up to date
+
+    def __init__(self, keyframes=None) :
+        """
+        A "constructor" that initializes a track.
+
+        Input:
+        keyframes - an optional iterable of pairs (time, q), where 'q' is
+                    a rotation quaternion or an instance of Rotation
+
+        A SquadException is raised if any keyframe is invalid.
+        """
+        self.__t = []
+        self.__q = []
+        self.__s = []
+        self.__arr = None
+        self.__synced = 0
+        if keyframes is not None :
+            for t, q in keyframes :
+                self.append(t, q)
+
+    def size(self) :
+        """Returns number of keyframes"""
+        return len(self.__t)
+
+    def getTimes(self) :
+        """Returns a list of keyframes' times"""
+        return list(self.__t)
+
+    def getKeyframe(self, idx) :
+        """Returns the keyframe 'idx' as a pair (time, FrozenQuaternion)"""
+        return self.__t[idx], self.__q[idx]
+
+    def getControl(self, idx) :
+        """Returns the SQUAD control quaternion of the keyframe 'idx' (FrozenQuaternion)"""
+        return self.__s[idx]
+
+    def __control(self, idx) :
+        # SQUAD control quaternion of an inner keyframe 'idx':
+        #
+        # s[i] = q[i] * exp( -( ln(q[i]^(-1)*q[i+1]) + ln(q[i]^(-1)*q[i-1]) ) / 4 )
+        qi = self.__q[idx]
+        qinv = qi.conj()
+        l = (qinv * self.__q[idx + 1]).log() + (qinv * self.__q[idx - 1]).log()
+        return FrozenQuaternion((qi * (l * -0.25).exp()).unit())
+
+    def append(self, t, q) :
+        """
+        Appends a keyframe at the end of the track.
+
+        Input:
+        t - time of the keyframe, must be greater than times of all keyframes
+        q - orientation (a rotation quaternion or an instance of Rotation),
+            it is automatically converted into a unit quaternion and negated
+            if needed, so that the track always follows the shorter path
+
+        A SquadException is raised if any argument is invalid.
+        """
+        if not InstanceCheck.isFloat(t) :
+            raise SquadException("Time must be a float value")
+        if self.__t and t <= self.__t[-1] :
+            raise SquadException("Times of keyframes must be strictly increasing")
+        if isinstance(q, Rotation) :
+            q = q.getRotationQuaternion()
+        if not Quaternion.isQuaternion(q) :
+            raise SquadException("Orientation must be a quaternion or a Rotation")
+        try :
+            q = q.unit()
+        except QuaternionException as qex :
+            raise SquadException("Invalid orientation: '{0}'".format(qex))
+
+        if self.__q :
+            prev = self.__q[-1]
+            if prev.o*q.o + prev.i*q.i + prev.j*q.j + prev.k*q.k < 0.0 :
+                q = -q
+        q = FrozenQuaternion(q)
+
+        self.__t.append(t)
+        self.__q.append(q)
+        self.__s.append(q)
+        n = len(self.__q)
+        if n >= 3 :
+            # the previous last keyframe now has both neighbours
+            self.__s[n - 2] = self.__control(n - 2)
+            self.__synced = min(self.__synced, n - 2)
+
+    def __segment(self, t) :
+        # Index of the segment [t[i], t[i+1]) and the local parameter in [0, 1]
+        times = self.__t
+        if t <= times[0] :
+            return 0, 0.0
+        if t >= times[-1] :
+            return len(times) - 2, 1.0
+        i = bisect.bisect_right(times, t) - 1
+        return i, (t - times[i]) / (times[i + 1] - times[i])
+
+    def evaluate(self, t) :
+        """
+        Orientation at time 't'.
+
+        Return:
+        a unit quaternion (an instance of Quaternion)
+
+        A SquadException is raised if the track is empty or 't' is not a float.
+        """
+        if not InstanceCheck.isFloat(t) :
+            raise SquadException("Time must be a float value")
+        n = len(self.__t)
+        if n == 0 :
+            raise SquadException("The track is empty")
+        if n == 1 :
+            return Quaternion(self.__q[0])
+
+        i, h = self.__segment(t)
+        # squad(q[i], q[i+1], s[i], s[i+1], h) =
+        #     slerp( slerp(q[i], q[i+1], h), slerp(s[i], s[i+1], h), 2*h*(1-h) )
+        a = Quaternion.slerp(self.__q[i], self.__q[i + 1], h)
+        b = Quaternion.slerp(self.__s[i], self.__s[i + 1], h)
+        return Quaternion.slerp(a, b, 2.0 * h * (1.0 - h))
+
+    def __arrays(self, np) :
+        # Returns arrays of times, keyframes and control quaternions,
+        # only rows of modified keyframes are updated
+        n = len(self.__t)
+        if self.__arr is None or self.__arr[0].shape[0] < n :
+            cap = max(16, 2 * n)
+            arr = (np.empty(cap), np.empty((cap, 4)), np.empty((cap, 4)))
+            if self.__arr is not None :
+                for old, new in zip(self.__arr, arr) :
+                    new[:self.__synced] = old[:self.__synced]
+            self.__arr = arr
+
+        ta, qa, sa = self.__arr
+        for idx in range(self.__synced, n) :
+            q, s = self.__q[idx], self.__s[idx]
+            ta[idx] = self.__t[idx]
+            qa[idx] = (q.o, q.i, q.j, q.k)
+            sa[idx] = (s.o, s.i, s.j, s.k)
+        self.__synced = n
+        return ta[:n], qa[:n], sa[:n]
+
+    def evaluateArray(self, times, out=None) :
+        """
+        Vectorized evaluation of orientations at all given times.
+
+        Input:
+        times - an array-like of times
+        out - an optional array of shape (N,4) where the quaternions are written into
+
+        Return:
+        an array of shape (N,4) with unit quaternions
+
+        A SquadException is raised if the track is empty or NumPy is not installed.
+        """
+        try :
+            np = backend.numpy()
+        except backend.BackendException as bex :
+            raise SquadException("Vectorized evaluation requires NumPy: '{0}'".format(bex))
+        n = len(self.__t)
+        if n == 0 :
+            raise SquadException("The track is empty")
+
+        tq = np.asarray(times, dtype=float).ravel()
+        m = tq.shape[0]
+        if out is None :
+            out = np.empty((m, 4))
+        elif out.shape != (m, 4) :
+            raise SquadException("'out' must be an array of shape (N,4)")
+
+        ta, qa, sa = self.__arrays(np)
+        if n == 1 :
+            out[:] = qa[0]
+            return out
+
+        i = np.searchsorted(ta, tq, side="right") - 1
+        np.clip(i, 0, n - 2, out=i)
+        h = (tq - ta[i]) / (ta[i + 1] - ta[i])
+        np.clip(h, 0.0, 1.0, out=h)
+
+        a = _slerpArrays(np, qa[i], qa[i + 1], h)
+        b = _slerpArrays(np, sa[i], sa[i + 1], h)
+        out[:] = _slerpArrays(np, a, b, 2.0 * h * (1.0 - h))
+        return out
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+# Copyright 2013, Jernej Kovacic
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+import sys
+import numpy as np
+from quaternion import Quaternion, QuaternionException
+from rotation import Rotation
+import squad
+from squad import KeyframeTrack, SquadException
+
+
+"""
+A collection of unit tests for SQUAD keyframe tracks,
+implemented by squad.KeyframeTrack.
+"""
+
+try :
+    q = Quaternion(1, 2, 3, 4).unit()
+    print("exp(log(q)) = {0}\n(correct: {1})".format(q.log().exp(), q))
+    i = Quaternion(i=1)
+    print("slerp(1, i, 0.5) = {0} (correct: 0.70711+0.70711i)".format(
+        Quaternion.slerp(Quaternion(1), i, 0.5)))
+    # opposite quaternions, the path must still consist of unit quaternions
+    hs = np.linspace(0.0, 1.0, 9)
+    mid = [ Quaternion.slerp(q, -q, h) for h in hs ]
+    print("slerp(q, -q, 0.5) = {0}, norm {1} (expected: 1)".format(mid[4], mid[4].norm()))
+    print("slerp(q, -q, 1) = {0} (correct: {1})".format(mid[8], -q))
+    pq = np.tile([ q.o, q.i, q.j, q.k ], (9, 1))
+    close = pq + 1e-12 * np.array([ 0.0, 1.0, -1.0, 0.0 ])
+    arr = squad._slerpArrays(np, np.vstack([ pq, pq ]), np.vstack([ -pq, close ]),
+                             np.concatenate([ hs, hs ]))
+    print("Array slerp of opposite and close rows: max. |norm-1| {0}, max. difference {1}".format(
+        np.abs(np.linalg.norm(arr, axis=1) - 1.0).max(),
+        max(abs(arr[k, 0] - m.o) + abs(arr[k, 1] - m.i) + abs(arr[k, 2] - m.j) +
+            abs(arr[k, 3] - m.k) for k, m in enumerate(mid))))
+    print()
+
+    # rotations about the z-axis with a constant angular velocity
+    # must be interpolated exactly
+    track = KeyframeTrack()
+    for n in range(5) :
+        track.append(float(n), Rotation(rz=1, angle=0.5*n))
+    for t in (0.0, 1.25, 2.5, 3.75, 4.0) :
+        r = Rotation.fromQuaternion(track.evaluate(t))
+        print("t={0}: angle {1} (expected: {2})".format(t, r.getAngle(), 0.5*t))
+    print()
+
+    # a general track: scalar and vectorized evaluations must match
+    track = KeyframeTrack([ (0.0, Rotation(1, 0, 0, 0.3)),
+                            (1.0, Rotation(0, 1, 0, 1.2)),
+                            (2.5, Rotation(1, 1, 0, -0.7)) ])
+    times = np.linspace(-0.5, 4.0, 37)
+    arr = track.evaluateArray(times)
+    track.append(4.0, Rotation(0, 0, 1, 2.0))
+    arr = track.evaluateArray(times)
+    diff = max( abs(arr[n][0] - track.evaluate(t).o) + abs(arr[n][1] - track.evaluate(t).i) +
+                abs(arr[n][2] - track.evaluate(t).j) + abs(arr[n][3] - track.evaluate(t).k)
+                for n, t in enumerate(times) )
+    print("Max. difference between scalar and vectorized evaluation: {0}".format(diff))
+    print("Max. deviation of norms from 1: {0}".format(np.abs(np.linalg.norm(arr, axis=1) - 1.0).max()))
+    ref = KeyframeTrack([ (t, track.getKeyframe(n)[1]) for n, t in enumerate(track.getTimes()) ])
+    print("Control quaternions, updated by appending, match a rebuilt track: {0}".format(
+        all(track.getControl(n) == ref.getControl(n) for n in range(track.size()))))
+
+except SquadException as ex:
+    print("\nSQUAD exception raised: '{0}'".format(ex), file=sys.stderr)
+except QuaternionException as ex:
+    print("\nQuaternion exception raised: '{0}'".format(ex), file=sys.stderr)
+else :
+    print("\nSQUAD test completed successfully.")
@@ -0,0 +1,355 @@
+# Copyright 2013, Jernej Kovacic
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+A module with a hierarchy of transforms (a scene graph), e.g. an
+articulated rig where each joint rotates about its pivot, relative
+to its parent joint.
+
+World transforms are cached. Modification of a node only marks the node
+as dirty and its world transform, as well as world transforms of its
+descendants, are recalculated when they are needed next time.
+
+Author: Jernej Kovacic
+"""
+
+import exception
+import backend
+from quaternion import FrozenQuaternion
+from rotation import Rotation, RotationException, Point3D, PointException
+
+
+class TransformException(exception.IException) :
+    """Exception raised at illegal operations with transforms"""
+    pass
+
+
+class TransformNode() :
+    """
+    A node of a transform hierarchy, i.e. a rotation about a pivot point,
+    relative to the node's parent.
+
+    A point 'p', given in the node's local coordinates, is transformed into
+    its parent's coordinates as:
+        p' = R*(p - pivot) + pivot
+    where R is the node's rotation. The world transform of a node is
+    a composition of local transforms of all its ancestors and itself.
+
+    Nodes are normally created by TransformTree.addNode().
+    """
+
+    # Private internal instance members:
+    # __parent - parent node (TransformNode or None for a root)
+    # __children - a list of child nodes
+    # __rot - local rotation (Rotation)
+    # __pivot - pivot of the rotation (Point3D)
+    # __dirty - True if the local transform was modified since the last update
+    # __version - incremented whenever the world transform is recalculated
+    # __seen - parent's __version at the last recalculation
+    # __wq - world rotation quaternion (FrozenQuaternion)
+    # __wt - world translation (a tuple of 3 floats)
+
+    def __init__(self, rot=None, pivot=None, parent=None) :
+        """
+        A "constructor" that initializes a node.
+
+        Input:
+        rot - local rotation (an instance of Rotation, default: no rotation)
+        pivot - pivot of the rotation (an instance of Point3D, default: origin)
+        parent - parent node (an instance of TransformNode, default: None)
+
+        A TransformException is raised if any argument is of invalid type.
+        """
+        if parent is not None and not TransformNode.isTransformNode(parent) :
+            raise TransformException("Parent must be an instance of TransformNode")
+
+        self.__parent = parent
+        self.__children = []
+        self.__version = 0
+        self.__seen = -1
+        self.__wq = None
+        self.__wt = None
+        self.__rot = Rotation(rz=1.0)
+        self.__pivot = Point3D()
+
+        if rot is not None :
+            self.setRotation(rot)
+        if pivot is not None :
+            self.setPivot(pivot)
+        self.__dirty = True
+
+        if parent is not None :
+            parent.__children.append(self)
+
+    def getParent(self) :
+        """Returns the parent node (None if this is a root node)"""
+        return self.__parent
+
+    def getChildren(self) :
+        """Returns a list of child nodes"""
+        return list(self.__children)
+
+    def getRotation(self) :
+        """
+        Returns the local rotation (an instance of Rotation).
+
+        If it is modified directly, invalidate() must be called afterwards.
+        """
+        return self.__rot
+
+    def getPivot(self) :
+        """Returns the pivot of the local rotation (a copy, an instance of Point3D)"""
+        return Point3D(self.__pivot)
+
+    def setRotation(self, rot) :
+        """
+        Sets a new local rotation.
+
+        A TransformException is raised if 'rot' is not an instance of Rotation.
+        """
+        if not isinstance(rot, Rotation) :
+            raise TransformException("Input must be an instance of Rotation")
+        self.__rot = rot
+        self.__dirty = True
+
+    def setAngle(self, angle=0.0) :
+        """
+        Sets a new angle (in radians) of the local rotation.
+
+        A TransformException is raised if 'angle' is not a float or integer value.
+        """
+        try :
+            self.__rot.setAngle(angle)
+        except RotationException as rex :
+            raise TransformException("Invalid angle: '{0}'".format(rex))
+        self.__dirty = True
+
+    def setAxis(self, rx=0.0, ry=0.0, rz=0.0) :
+        """
+        Sets a new axis of the local rotation, see Rotation.setAxis.
+
+        A TransformException is raised if the axis is invalid.
+        """
+        try :
+            self.__rot.setAxis(rx, ry, rz)
+        except RotationException as rex :
+            raise TransformException("Invalid axis: '{0}'".format(rex))
+        self.__dirty = True
+
+    def setPivot(self, x=0.0, y=0.0, z=0.0) :
+        """
+        Sets a new pivot of the local rotation. 'x' may also be an instance
+        of Point3D. In this case, 'y' and 'z' are ignored.
+
+        A TransformException is raised if input arguments are of invalid types.
+        """
+        try :
+            self.__pivot = Point3D(x, y, z)
+        except PointException :
+            raise TransformException("Invalid pivot")
+        self.__dirty = True
+
+    def invalidate(self) :
+        """
+        Marks the local transform as modified. It must be called after
+        the rotation, returned by getRotation(), is modified directly.
+        """
+        self.__dirty = True
+
+    def __update(self) :
+        # Recalculates the world transform if the local transform was
+        # modified or the parent's world transform has changed.
+        # The parent's world transform must already be up to date.
+        # Returns True if the world transform was recalculated.
+        parent = self.__parent
+        pver = parent.__version if parent is not None else 0
+        if not self.__dirty and self.__seen == pver :
+            return False
+
+        # local transform: p' = R*p + (pivot - R*pivot)
+        ql = self.__rot.getRotationQuaternion()
+        m = ql.rotationMatrix()
+        px, py, pz = self.__pivot.x, self.__pivot.y, self.__pivot.z
+        tl = ( px - (m[0][0]*px + m[0][1]*py + m[0][2]*pz),
+               py - (m[1][0]*px + m[1][1]*py + m[1][2]*pz),
+               pz - (m[2][0]*px + m[2][1]*py + m[2][2]*pz) )
+
+        if parent is None :
+            self.__wq = ql
+            self.__wt = tl
+        else :
+            # world = parent's world (applied last) composed with local
+            self.__wq = FrozenQuaternion(parent.__wq * ql)
+            mp = parent.__wq.rotationMatrix()
+            tp = parent.__wt
+            self.__wt = tuple(
+                mp[r][0]*tl[0] + mp[r][1]*tl[1] + mp[r][2]*tl[2] + tp[r]
+                for r in range(3) )
+
+        self.__dirty = False
+        self.__seen = pver
+        self.__version += 1
+        return True
+
+    def _refresh(self) :
+        # Brings the world transforms of the node and all its ancestors
+        # up to date. Only used internally by this module.
+        chain = []
+        node = self
+        while node is not None :
+            chain.append(node)
+            node = node.__parent
+        for node in reversed(chain) :
+            node.__update()
+
+    def _updateFromParent(self) :
+        # As __update(), used by TransformTree that already
+        # processes nodes in order (parents before children).
+        return self.__update()
+
+    def _world(self) :
+        # Returns the cached world quaternion and translation without any
+        # update. Used by TransformTree after it has updated all nodes.
+        return self.__wq, self.__wt
+
+    def getWorldQuaternion(self) :
+        """Returns the world rotation quaternion (an instance of FrozenQuaternion)"""
+        self._refresh()
+        return self.__wq
+
+    def getWorldTranslation(self) :
+        """Returns the world translation (an instance of Point3D)"""
+        self._refresh()
+        return Point3D(*self.__wt)
+
+    def toWorld(self, p) :
+        """
+        Transforms the point 'p', given in the node's local coordinates,
+        into world coordinates.
+
+        Input:
+        - p - a point to be transformed (an instance of Point3D)
+
+        Returns coordinates of the transformed point (an instance of Point3D).
+
+        A TransformException is raised if 'p' is not an instance of Point3D.
+        """
+        if not Point3D.isPoint3D(p) :
+            raise TransformException("Input must be an instance of Point3D")
+        self._refresh()
+        m = self.__wq.rotationMatrix()
+        t = self.__wt
+        return Point3D( *(m[r][0]*p.x + m[r][1]*p.y + m[r][2]*p.z + t[r]
+                          for r in range(3)) )
+
+    @staticmethod
+    def isTransformNode(n) :
+        """Is 'n' an instance of TransformNode?"""
+        return isinstance(n, TransformNode)
+
+
+class TransformTree() :
+    """
+    A hierarchy of TransformNodes. Nodes are kept in order of their
+    creation, hence each parent precedes all its descendants and the whole
+    tree is updated in a single pass, without any recursion.
+    """
+
+    # Private internal instance members:
+    # __nodes - a list of all nodes (TransformNode), parents before children
+    # __index - maps nodes to their positions in __nodes
+
+    def __init__(self) :
+        """A "constructor" that initializes an empty tree"""
+        self.__nodes = []
+        self.__index = {}
+
+    def addNode(self, rot=None, pivot=None, parent=None) :
+        """
+        Creates a new node and appends it to the tree.
+
+        Input:
+        rot - local rotation (an instance of Rotation, default: no rotation)
+        pivot - pivot of the rotation (an instance of Point3D, default: origin)
+        parent - parent node, already in the tree (default: None, i.e. a new root)
+
+        Return:
+        the new node (an instance of TransformNode)
+
+        A TransformException is raised if 'parent' does not belong to this tree
+        or any argument is of invalid type.
+        """
+        if parent is not None and parent not in self.__index :
+            raise TransformException("Parent does not belong to this tree")
+        node = TransformNode(rot, pivot, parent)
+        self.__index[node] = len(self.__nodes)
+        self.__nodes.append(node)
+        return node
+
+    def nodes(self) :
+        """Returns a list of all nodes, parents before children"""
+        return list(self.__nodes)
+
+    def size(self) :
+        """Returns number of nodes"""
+        return len(self.__nodes)
+
+    def index(self, node) :
+        """
+        Returns the position of the node, i.e. its row in batches,
+        returned by worldQuaternions() and worldTranslations().
+
+        A TransformException is raised if the node does not belong to this tree.
+        """
+        try :
+            return self.__index[node]
+        except KeyError :
+            raise TransformException("Node does not belong to this tree")
+
+    def update(self) :
+        """
+        Recalculates world transforms of all modified nodes
+        and their descendants.
+
+        Return:
+        number of recalculated nodes
+        """
+        count = 0
+        for node in self.__nodes :
+            if node._updateFromParent() :
+                count += 1
+        return count
+
+    def worldQuaternions(self) :
+        """
+        Returns world rotation quaternions of all nodes as a batch of shape
+        (N,4), in the order of nodes() (see the module backend).
+        """
+        self.update()
+        rows = []
+        for node in self.__nodes :
+            q = node._world()[0]
+            rows.append((q.o, q.i, q.j, q.k))
+        return backend.getBackend().asArray(rows, 4)
+
+    def worldTranslations(self) :
+        """
+        Returns world translations of all nodes as a batch of shape (N,3),
+        in the order of nodes() (see the module backend).
+        """
+        self.update()
+        rows = []
+        for node in self.__nodes :
+            rows.append(node._world()[1])
+        return backend.getBackend().asArray(rows, 3)
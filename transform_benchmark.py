@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+# Copyright 2013, Jernej Kovacic
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+import random
+import sys
+import time
+from rotation import Rotation, Point3D
+from transform import TransformTree, TransformException
+
+"""
+A benchmark of per-frame update costs of transform hierarchies,
+implemented by the module transform.
+
+For each tree size and fraction of modified nodes, random nodes' angles
+are modified and the tree is updated, which is repeated for several
+"frames". The average time per frame is reported and compared to the
+time of a full recalculation of all nodes.
+"""
+
+SIZES = (100, 1000, 10000)
+FRACTIONS = (0.01, 0.1, 0.5, 1.0)
+FRAMES = 20
+
+
+def buildTree(n, rng) :
+    """Builds a random tree with 'n' nodes, each node's parent is a random earlier node"""
+    tree = TransformTree()
+    nodes = []
+    for idx in range(n) :
+        parent = nodes[rng.randrange(idx)] if idx > 0 else None
+        rot = Rotation(rng.uniform(-1, 1), rng.uniform(-1, 1), 1.0, rng.uniform(-3, 3))
+        pivot = Point3D(rng.uniform(-1, 1), rng.uniform(-1, 1), rng.uniform(-1, 1))
+        nodes.append(tree.addNode(rot, pivot, parent))
+    tree.update()
+    return tree, nodes
+
+
+def frameTime(tree, nodes, fraction, rng) :
+    """Average time (in seconds) of a frame and average number of recalculated nodes"""
+    changed = max(1, int(fraction * len(nodes)))
+    total, recalc = 0.0, 0
+    for _ in range(FRAMES) :
+        sample = rng.sample(nodes, changed)
+        t0 = time.perf_counter()
+        for node in sample :
+            node.setAngle(rng.uniform(-3, 3))
+        recalc += tree.update()
+        total += time.perf_counter() - t0
+    return total / FRAMES, recalc / float(FRAMES)
+
+
+try :
+    rng = random.Random(0)
+    print("{0:>8s} {1:>9s} {2:>12s} {3:>12s} {4:>9s}".format(
+        "nodes", "modified", "recalc.", "ms/frame", "vs. full"))
+    for n in SIZES :
+        tree, nodes = buildTree(n, rng)
+        full, _ = frameTime(tree, nodes, 1.0, rng)
+        for fraction in FRACTIONS :
+            t, recalc = frameTime(tree, nodes, fraction, rng)
+            print("{0:8d} {1:8.0f}% {2:12.1f} {3:12.3f} {4:8.1f}%".format(
+                n, 100.0 * fraction, recalc, 1000.0 * t, 100.0 * t / full))
+
+except TransformException as ex:
+    print("\nTransform exception raised: '{0}'".format(ex), file=sys.stderr)
+else :
+    print("\nTransform benchmark completed successfully.")
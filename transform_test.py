@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+
+# Copyright 2013, Jernej Kovacic
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+import math
+import sys
+from rotation import Rotation, RotationException, Point3D
+from transform import TransformTree, TransformException
+
+
+"""
+A collection of unit tests for transform hierarchies,
+implemented by the module transform.
+"""
+
+try :
+    # A planar "arm" with a shoulder at the origin and
+    # an elbow at (1, 0, 0), both rotating about the z-axis.
+    tree = TransformTree()
+    shoulder = tree.addNode(Rotation(rz=1, angle=math.pi/2))
+    elbow = tree.addNode(Rotation(rz=1, angle=math.pi/2), Point3D(1, 0, 0), shoulder)
+    print("Recalculated nodes: {0} (expected: 2)".format(tree.update()))
+    print("Recalculated nodes: {0} (expected: 0)".format(tree.update()))
+
+    p = Point3D(2, 0, 0)
+    print("Hand {0} --> {1}".format(p, elbow.toWorld(p)))
+    print("Expected: (-1, 1, 0)")
+    print("Elbow's world quaternion: {0}".format(elbow.getWorldQuaternion()))
+    print("Expected: 0+0i+0j+1k")
+    print()
+
+    elbow.setAngle(0)
+    print("Recalculated nodes after the elbow is modified: {0} (expected: 1)".format(tree.update()))
+    print("Hand {0} --> {1}".format(p, elbow.toWorld(p)))
+    print("Expected: (0, 2, 0)")
+
+    shoulder.setAngle(-math.pi/2)
+    print("Hand {0} --> {1}".format(p, elbow.toWorld(p)))
+    print("Expected: (0, -2, 0)")
+    print("Recalculated nodes after the shoulder is modified: {0} (expected: 0, already updated)".format(tree.update()))
+    print()
+
+    print("World quaternions:\n{0}".format(tree.worldQuaternions()))
+    print("World translations:\n{0}".format(tree.worldTranslations()))
+
+except TransformException as ex:
+    print("\nTransform exception raised: '{0}'".format(ex), file=sys.stderr)
+except RotationException as ex:
+    print("\nRotation exception raised: '{0}'".format(ex), file=sys.stderr)
+else :
+    print("\nTransform test completed successfully.")
@@ -0,0 +1,228 @@
+# Copyright 2013, Jernej Kovacic
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+A module with vectorized validation of batches of quaternions (N,4)
+and points (N,3), e.g. of data, read from files or received from sensors.
+
+Batches are checked for a numeric dtype, their shape, finiteness of all
+elements (no NaN or Inf) and, optionally, unit norms of quaternions.
+Rows that fail the checks are handled by one of policies:
+    "raise"  - a QuaternionException or a PointException is raised
+    "mask"   - invalid rows are removed from the returned batch
+    "repair" - invalid rows are repaired: non-finite quaternions are
+               replaced by the identity (1, 0, 0, 0), other quaternions
+               are normalized; non-finite elements of points are set to 0
+Invalid dtypes and shapes always raise an exception.
+
+NumPy is imported on first validation.
+
+Author: Jernej Kovacic
+"""
+
+import backend
+from quaternion import QuaternionException
+from rotation import PointException
+from instance_checker import InstanceCheck
+
+
+# Default tolerance of deviations |norm^2 - 1| of unit quaternions
+DEFAULT_UNIT_TOLERANCE = 1e-6
+
+# Policies of handling invalid rows
+POLICIES = ("raise", "mask", "repair")
+
+# Maximum number of indices, listed by ValidationReport.__str__
+_MAX_LISTED = 10
+
+
+class ValidationReport() :
+    """
+    A compact report of a batch's validation, i.e. indices of rows
+    (of the original batch) that failed the checks.
+    """
+
+    # Private internal instance members:
+    # __np - the numpy module
+    # __n - number of rows
+    # __nonFinite - indices of rows with NaN or Inf elements (array)
+    # __notUnit - indices of finite rows whose norm deviates from 1 (array)
+    # __policy - the applied policy
+
+    def __init__(self, np, n, nonFinite, notUnit, policy) :
+        """
+        A "constructor", called by validation functions.
+
+        Input:
+        np - the numpy module
+        n - number of rows of the batch
+        nonFinite - an array of indices of rows with non-finite elements
+        notUnit - an array of indices of rows that are not unit quaternions
+        policy - the applied policy (see POLICIES)
+        """
+        self.__np = np
+        self.__n = n
+        self.__nonFinite = nonFinite
+        self.__notUnit = notUnit
+        self.__policy = policy
+
+    def getCount(self) :
+        """Returns number of validated rows"""
+        return self.__n
+
+    def getPolicy(self) :
+        """Returns the applied policy"""
+        return self.__policy
+
+    def getNonFinite(self) :
+        """Returns an array of indices of rows with NaN or Inf elements"""
+        return self.__nonFinite
+
+    def getNotUnit(self) :
+        """Returns an array of indices of finite rows that are not unit quaternions"""
+        return self.__notUnit
+
+    def getInvalid(self) :
+        """Returns a sorted array of indices of all invalid rows"""
+        return self.__np.union1d(self.__nonFinite, self.__notUnit)
+
+    def getMask(self) :
+        """Returns a boolean array, True for valid rows"""
+        mask = self.__np.ones(self.__n, dtype=bool)
+        mask[self.__nonFinite] = False
+        mask[self.__notUnit] = False
+        return mask
+
+    def isValid(self) :
+        """Are all rows valid?"""
+        return self.__nonFinite.size == 0 and self.__notUnit.size == 0
+
+    def __str__(self) :
+        """
+        A brief summary of the report, e.g.
+        "1000 rows, 2 non-finite [3, 17], 1 not unit [5]".
+
+        The method is called by print().
+        """
+        def listed(idx) :
+            s = ", ".join(str(i) for i in idx[:_MAX_LISTED].tolist())
+            return "[" + s + (", ...]" if idx.size > _MAX_LISTED else "]")
+
+        outstr = "{0} rows, {1} non-finite {2}".format(
+                    self.__n, self.__nonFinite.size, listed(self.__nonFinite))
+        if self.__notUnit.size :
+            outstr += ", {0} not unit {1}".format(self.__notUnit.size, listed(self.__notUnit))
+        return outstr
+
+
+def _validate(a, cols, exc, name, policy, unit, tolerance) :
+    # Common implementation of validation of quaternions and points,
+    # 'exc' is the exception class, 'name' is used in messages
+    if policy not in POLICIES :
+        raise exc("Unknown validation policy '{0}'".format(policy))
+    if unit and (not InstanceCheck.isFloat(tolerance) or tolerance < 0.0) :
+        raise exc("Tolerance must be a non-negative float")
+    try :
+        np = backend.numpy()
+    except backend.BackendException as bex :
+        raise exc("Validation requires NumPy: '{0}'".format(bex))
+
+    raw = np.asarray(a)
+    if raw.dtype.kind not in "iuf" :
+        raise exc("{0} must be real numbers, not '{1}'".format(name, raw.dtype))
+    arr = raw.astype(float, copy=False)
+    if arr.ndim == 1 and arr.shape[0] == cols :
+        arr = arr.reshape(1, cols)
+    if arr.ndim != 2 or arr.shape[1] != cols :
+        raise exc("{0} must be a batch of shape (N,{1}), not {2}".format(name, cols, raw.shape))
+
+    n = arr.shape[0]
+    finite = np.isfinite(arr).all(axis=1)
+    nonFinite = np.flatnonzero(~finite)
+    notUnit = np.empty(0, dtype=nonFinite.dtype)
+    if unit :
+        nsq = np.einsum("ij,ij->i", arr, arr)
+        with np.errstate(invalid="ignore") :
+            far = np.abs(nsq - 1.0) > tolerance
+        notUnit = np.flatnonzero(far & finite)
+    report = ValidationReport(np, n, nonFinite, notUnit, policy)
+
+    if report.isValid() :
+        return arr, report
+    if policy == "raise" :
+        raise exc("Invalid {0}: {1}".format(name.lower(), report))
+    if policy == "mask" :
+        return arr[report.getMask()], report
+
+    # repair, the input is not modified
+    if np.shares_memory(arr, raw) :
+        arr = arr.copy()
+    if cols == 4 :
+        arr[nonFinite] = (1.0, 0.0, 0.0, 0.0)
+        if notUnit.size :
+            rows = arr[notUnit]
+            # rows are scaled by their largest components first, squares
+            # of huge (finite) components would overflow
+            s = np.abs(rows).max(axis=1)
+            zero = s < 1e-12
+            rows[~zero] /= s[~zero, None]
+            rows[~zero] /= np.linalg.norm(rows[~zero], axis=1)[:, None]
+            rows[zero] = (1.0, 0.0, 0.0, 0.0)
+            arr[notUnit] = rows
+    else :
+        rows = arr[nonFinite]
+        rows[~np.isfinite(rows)] = 0.0
+        arr[nonFinite] = rows
+    return arr, report
+
+
+def validateQuaternions(q, policy="raise", unit=False, tolerance=DEFAULT_UNIT_TOLERANCE) :
+    """
+    Validates a batch of quaternions.
+
+    Input:
+    q - a batch of shape (N,4) (or a single row)
+    policy - handling of invalid rows: "raise", "mask" or "repair" (default: "raise")
+    unit - if True, quaternions must be unit ones (default: False)
+    tolerance - maximum deviation |norm^2 - 1| of unit quaternions
+                (default: DEFAULT_UNIT_TOLERANCE)
+
+    Return:
+    a tuple (batch, report), where 'batch' is a float array of shape (N,4)
+    (without invalid rows if 'policy' is "mask") and 'report' is an instance
+    of ValidationReport. The input is never modified.
+
+    A QuaternionException is raised if the dtype or the shape is invalid
+    or, if 'policy' is "raise", if any row is invalid.
+    """
+    return _validate(q, 4, QuaternionException, "Quaternions", policy, unit, tolerance)
+
+
+def validatePoints(points, policy="raise") :
+    """
+    Validates a batch of points.
+
+    Input:
+    points - a batch of shape (N,3) (or a single row)
+    policy - handling of invalid rows: "raise", "mask" or "repair" (default: "raise")
+
+    Return:
+    a tuple (batch, report), where 'batch' is a float array of shape (N,3)
+    (without invalid rows if 'policy' is "mask") and 'report' is an instance
+    of ValidationReport. The input is never modified.
+
+    A PointException is raised if the dtype or the shape is invalid
+    or, if 'policy' is "raise", if any row is invalid.
+    """
+    return _validate(points, 3, PointException, "Points", policy, False, 0.0)
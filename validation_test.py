@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+# Copyright 2013, Jernej Kovacic
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import print_function
+import sys
+import numpy as np
+from quaternion import QuaternionException
+from rotation import PointException
+from random_rotation import RandomRotationGenerator
+from validation import validateQuaternions, validatePoints
+
+
+"""
+A collection of unit tests for vectorized validation of batches,
+implemented by the module validation.
+"""
+
+try :
+    n = 100000
+    qs = RandomRotationGenerator(seed=7).uniform(n)
+    qs[3, 1] = np.nan
+    qs[17] = (np.inf, 0, 0, 0)
+    qs[5] *= 2.0
+    qs[8] = 0.0
+    orig = qs.copy()
+
+    res, rep = validateQuaternions(qs, policy="mask")
+    print("Finiteness only: {0}".format(rep))
+    try :
+        validateQuaternions(qs, unit=True)
+        print("ERROR: invalid quaternions accepted")
+    except QuaternionException as ex :
+        print("Rejected as expected: {0}".format(ex))
+
+    res, rep = validateQuaternions(qs, policy="mask", unit=True)
+    print("Masked: {0} rows left (expected: {1}), invalid rows {2}".format(
+        res.shape[0], n - 4, rep.getInvalid()))
+
+    res, rep = validateQuaternions(qs, policy="repair", unit=True)
+    print("Repaired: rows 3, 5, 8, 17: {0}".format(res[[3, 5, 8, 17]].tolist()))
+    print("Expected: identity, {0}, identity, identity".format((orig[5] / 2.0).tolist()))
+    print("Input not modified: {0}".format(np.array_equal(qs, orig, equal_nan=True)))
+    big = np.array([ [ 1e200, 0.0, 0.0, 0.0 ], [ 3e300, -4e300, 0.0, 0.0 ], [ 1e-200, 0.0, 1e-200, 0.0 ] ])
+    res, rep = validateQuaternions(big, policy="repair", unit=True)
+    print("Repaired huge components: {0}".format(res[:2].tolist()))
+    print("Expected: [[1.0, 0.0, 0.0, 0.0], [0.6, -0.8, 0.0, 0.0]]")
+    res, rep = validateQuaternions(np.vstack([ qs, big ]), policy="repair", unit=True)
+    print("All repaired rows are unit: max. |norm-1| = {0}".format(
+        np.abs(np.linalg.norm(res, axis=1) - 1.0).max()))
+    print()
+
+    pts = np.arange(30, dtype=np.int32).reshape(10, 3)
+    res, rep = validatePoints(pts)
+    print("Integer points: dtype {0}, valid: {1}".format(res.dtype, rep.isValid()))
+    fp = pts.astype(float)
+    fp[4, 2] = -np.inf
+    res, rep = validatePoints(fp, policy="repair")
+    print("Repaired point 4: {0} (expected: [12.0, 13.0, 0.0]), {1}".format(res[4].tolist(), rep))
+    for bad in (np.zeros((5, 4)), np.array([["a", "b", "c"]])) :
+        try :
+            validatePoints(bad, policy="mask")
+            print("ERROR: invalid batch accepted")
+        except PointException as ex :
+            print("Rejected as expected: {0}".format(ex))
+
+except QuaternionException as ex:
+    print("\nQuaternion exception raised: '{0}'".format(ex), file=sys.stderr)
+except PointException as ex:
+    print("\nPoint exception raised: '{0}'".format(ex), file=sys.stderr)
+else :
+    print("\nValidation test completed successfully.")